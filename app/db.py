@@ -1,9 +1,53 @@
+import time
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .settings import settings
+from .utils.metrics import metrics
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=settings.DEBUG)
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+  '''
+  Queue pool that records how long checkouts wait and how many connections are in use, for sizing the pool.
+  '''
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      return super()._do_get()
+    except PoolTimeoutError:
+      metrics.increment("db.pool_timeouts")
+      raise
+    finally:
+      metrics.observe("db.pool_checkout_wait", time.perf_counter() - started)
+      self._report()
+
+  def _do_return_conn(self, record):
+    super()._do_return_conn(record)
+    self._report()
+
+  def _report(self):
+    metrics.set_gauge("db.pool_in_use", self.checkedout())
+    metrics.set_gauge("db.pool_overflow", max(self.overflow(), 0))
+    metrics.set_gauge("db.pool_size", self.size())
+
+
+engine = create_async_engine(
+  SQLALCHEMY_DATABASE_URL,
+  echo=settings.DEBUG,
+  poolclass=InstrumentedAsyncAdaptedQueuePool,
+  pool_size=settings.DB_POOL_SIZE,
+  max_overflow=settings.DB_MAX_OVERFLOW,
+  pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+  pool_pre_ping=settings.DB_POOL_PRE_PING,
+  pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+  # asyncpg's own statement cache and the dialect's prepared statement cache, 0 disables both for pgbouncer
+  connect_args={
+    "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+  }
+)
 SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
@@ -14,8 +14,36 @@ async def get_db_context():
     async with SessionLocal() as session:
         yield session
 
+@asynccontextmanager
+async def use_db_context(db: AsyncSession | None = None):
+    '''
+    Reuses a session owned by the caller, or opens one when none is given.
+    A failure rolls the shared session back so later calls on it can continue.
+    '''
+    if db is None:
+        async with SessionLocal() as session:
+            yield session
+        return
+
+    try:
+        yield db
+    except Exception:
+        await db.rollback()
+        raise
+
+_mail_client: MailService | None = None
+
 def get_mail_client() -> MailService:
-    return MailService()
+    global _mail_client
+    if _mail_client is None:
+        _mail_client = MailService()
+    return _mail_client
+
+async def close_mail_client():
+    global _mail_client
+    if _mail_client is not None:
+        await _mail_client.close()
+        _mail_client = None
 
 def get_report_service() -> ReportService:
     return ReportService()
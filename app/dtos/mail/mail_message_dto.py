@@ -3,33 +3,33 @@ from pydantic import BaseModel
 
 
 class MailEmailAddressDto(BaseModel):
-  name: str | None
-  address: str | None
+  name: str | None = None
+  address: str | None = None
 
 class MailRecipientDto(BaseModel):
-  email_address: MailEmailAddressDto | None
+  email_address: MailEmailAddressDto | None = None
 
 
 class MailAttachmentDto(BaseModel):
   id: str
-  odata_type: str | None
+  odata_type: str | None = None
   content_type: Optional[str] = None
   name: Optional[str] = None
   size: Optional[int] = None
+  is_inline: Optional[bool] = None
 
-  # The base64-encoded contents of the file.
-  content_bytes: bytes | None
+  # The base64-encoded contents of the file, only set when the content was requested.
+  content_bytes: bytes | None = None
 
 
 class MailMessageDto(BaseModel):
   id: str
-  body_preview: str | None
-  subject: str | None
-  has_attachment: bool | None
-  sender: MailRecipientDto | None
-  bcc_recipients: List[MailRecipientDto] | None
-  cc_recipients: List[MailRecipientDto] | None
-  to_recipients: List[MailRecipientDto] | None
-  from_: MailRecipientDto | None
-  attachments: List[MailAttachmentDto] | None
-
+  body_preview: str | None = None
+  subject: str | None = None
+  has_attachment: bool | None = None
+  sender: MailRecipientDto | None = None
+  bcc_recipients: List[MailRecipientDto] | None = None
+  cc_recipients: List[MailRecipientDto] | None = None
+  to_recipients: List[MailRecipientDto] | None = None
+  from_: MailRecipientDto | None = None
+  attachments: List[MailAttachmentDto] | None = None
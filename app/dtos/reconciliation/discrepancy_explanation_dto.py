@@ -0,0 +1,32 @@
+from decimal import Decimal
+from typing import List
+from pydantic import BaseModel
+
+
+class DiscrepancyTransactionDto(BaseModel):
+  order_id: str
+  timestamp: str
+  amount: Decimal
+  minutes_from_cutoff: float
+
+
+class DiscrepancyExplanationDto(BaseModel):
+  '''
+  action is "remove" for window transactions that should be excluded and "include" for transactions outside the window that should be added
+  '''
+  action: str
+  transactions: List[DiscrepancyTransactionDto]
+  total_minutes_from_cutoff: float
+
+
+class DiscrepancyExplanationResultDto(BaseModel):
+  window_transaction_count: int
+  window_transaction_total: Decimal
+  count_difference: int
+  amount_difference: Decimal
+  candidates_considered: int
+  timed_out: bool
+  # FAC rows left out because their timestamp or amount could not be parsed
+  invalid_timestamp_rows: int = 0
+  invalid_amount_rows: int = 0
+  explanations: List[DiscrepancyExplanationDto]
@@ -0,0 +1,9 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class ReconcileSettlementDto(BaseModel):
+  visa_net_report_file_name: str
+  assistant_id: Optional[int] = None
+  email_id: Optional[str] = None
+  attachment_id: Optional[str] = None
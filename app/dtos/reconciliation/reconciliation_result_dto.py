@@ -0,0 +1,19 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from pydantic import BaseModel
+
+
+class ReconciliationResultDto(BaseModel):
+  visa_net_report_file_name: str
+  visa_net_report_date: date
+  visa_net_transaction_count: int
+  visa_net_settlement_amount: Decimal
+  fac_report_file_name: Optional[str] = None
+  fac_start_date: Optional[date] = None
+  fac_end_date: Optional[date] = None
+  fac_transaction_count: Optional[int] = None
+  fac_transaction_total: Optional[Decimal] = None
+  fac_invalid_row_count: int = 0
+  is_matched: bool = False
+  is_already_completed: bool = False
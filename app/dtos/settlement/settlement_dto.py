@@ -0,0 +1,49 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel
+
+from app.models.settlement import SettlementModel
+
+class SettlementDto(BaseModel):
+  id: int
+  settlement_date: Optional[date] = None
+  settlement_status: str
+  settlement_amount: Optional[Decimal] = None
+  settlement_transaction_count: Optional[int] = None
+  visa_net_report_file_name: Optional[str] = None
+  fac_report_file_name: Optional[str] = None
+  fac_start_date: Optional[date] = None
+  fac_start_time: Optional[time] = None
+  fac_end_date: Optional[date] = None
+  fac_end_time: Optional[time] = None
+  fac_report_transaction_count: Optional[int] = None
+  fac_report_transaction_total: Optional[Decimal] = None
+  email_id: Optional[str] = None
+  attachment_id: Optional[str] = None
+  attempts: Optional[int] = None
+  created_at: Optional[datetime] = None
+  last_attempt_at: Optional[datetime] = None
+
+  @staticmethod
+  def from_model(settlement_model: SettlementModel):
+    return SettlementDto(
+      id=settlement_model.id, settlement_date=settlement_model.settlement_date,
+      settlement_status=settlement_model.settlement_status.name,
+      settlement_amount=settlement_model.settlement_amount,
+      settlement_transaction_count=settlement_model.settlement_transaction_count,
+      visa_net_report_file_name=settlement_model.visa_net_report_file_name,
+      fac_report_file_name=settlement_model.fac_report_file_name,
+      fac_start_date=settlement_model.fac_start_date, fac_start_time=settlement_model.fac_start_time,
+      fac_end_date=settlement_model.fac_end_date, fac_end_time=settlement_model.fac_end_time,
+      fac_report_transaction_count=settlement_model.fac_report_transaction_count,
+      fac_report_transaction_total=settlement_model.fac_report_transaction_total,
+      email_id=settlement_model.email_id, attachment_id=settlement_model.attachment_id,
+      attempts=settlement_model.attemps, created_at=settlement_model.created_at,
+      last_attempt_at=settlement_model.last_attempt_at
+    )
+
+
+class SettlementPageDto(BaseModel):
+  items: List[SettlementDto]
+  next_cursor: Optional[str] = None
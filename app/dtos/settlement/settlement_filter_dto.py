@@ -0,0 +1,10 @@
+from datetime import date
+from typing import Optional
+from pydantic import BaseModel
+
+from app.enums.settlement_status import SettlementStatus
+
+class SettlementFilterDto(BaseModel):
+  status: Optional[SettlementStatus] = None
+  date_from: Optional[date] = None
+  date_to: Optional[date] = None
@@ -0,0 +1,10 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class BatchExtractVisaNetDto(BaseModel):
+  '''
+  Either file names in the VisaNet files folder, or a directory relative to it. The folder itself is used when neither is set.
+  '''
+  file_names: Optional[List[str]] = None
+  directory: Optional[str] = None
@@ -0,0 +1,7 @@
+from enum import IntEnum
+
+class JobStatus(IntEnum):
+  Pending = 1
+  Running = 2
+  Completed = 3
+  Failed = 4
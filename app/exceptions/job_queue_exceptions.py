@@ -0,0 +1,3 @@
+class JobQueueFullError(RuntimeError):
+  def __init__(self, message):
+    super().__init__(message)
@@ -6,11 +6,22 @@ from .routes.mail_routes import mail_router
 from .routes.report_routes import report_router
 from .routes.responses_routes import responses_router
 from .routes.notification_routes import notification_router
+from .routes.reconciliation_routes import reconciliation_router
+from .routes.visa_net_routes import visa_net_router
+from .routes.metrics_routes import metrics_router
+from .routes.settlement_routes import settlement_router
 from datetime import datetime
 from apscheduler.triggers.interval import IntervalTrigger
 
 import logging
-from app.workers.worker import process_email_event, process_settlement_event, scheduler, renew_subscription
+from app.workers.worker import consumer_supervisor, drain_mail_backlog, scheduler, renew_subscription
+from app.services.report_processing.fac_browser_pool import fac_browser_pool
+from app.services.report_processing.visa_net_batch_service import shutdown_extraction_pool
+from app.workers.shared_queue import start_job_queues, stop_job_queues
+from app.dependencies import close_mail_client
+from app.workers.inbox_poller import inbox_poller
+from app.workers.notification_intake import notification_intake
+from app.settings import settings
 
 logging.basicConfig(
   level=logging.INFO,
@@ -18,16 +29,28 @@ logging.basicConfig(
 )
 
 async def lifespan(application: FastAPI):
+  await fac_browser_pool.start()
+  await start_job_queues()
+
   scheduler.add_job(renew_subscription, IntervalTrigger(minutes=30), id="renew_subscription")
-  # TODO: Remember to add these
-  # scheduler.add_job(process_email_event, IntervalTrigger(minutes=30), id="process_email_event")
-  # scheduler.add_job(process_settlement_event, IntervalTrigger(minutes=30), id="process_settlement_event")
-  
+  if settings.MAIL_BACKLOG_DRAIN_ON_STARTUP:
+    scheduler.add_job(drain_mail_backlog, id="drain_mail_backlog", next_run_time=datetime.now())
   scheduler.start()
+  consumer_supervisor.start()
+  notification_intake.start()
+  if settings.MAIL_DELTA_POLLER_ENABLED:
+    inbox_poller.start()
 
   yield
 
+  await inbox_poller.stop()
+  await notification_intake.stop()
+  await consumer_supervisor.stop()
   scheduler.shutdown(wait=True)
+  await stop_job_queues()
+  await fac_browser_pool.stop()
+  await close_mail_client()
+  shutdown_extraction_pool()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -36,5 +59,9 @@ app.include_router(mail_router)
 app.include_router(report_router)
 app.include_router(responses_router)
 app.include_router(notification_router)
+app.include_router(reconciliation_router)
+app.include_router(visa_net_router)
+app.include_router(metrics_router)
+app.include_router(settlement_router)
 
 
@@ -1,2 +1,5 @@
 from .settlement import SettlementModel
-from .assistant import AssistantModel
\ No newline at end of file
+from .assistant import AssistantModel
+from .visa_net_extraction import VisaNetExtractionModel
+from .job import JobModel
+from .sync_state import SyncStateModel
\ No newline at end of file
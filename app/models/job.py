@@ -0,0 +1,26 @@
+from app.enums.job_status import JobStatus
+from ..db import Base
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, Text, text, Enum as SQLAEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+class JobModel(Base):
+  __tablename__ = "job_queue"
+  __table_args__ = (
+    # Only open jobs are indexed, completed jobs are deleted on ack and failed ones are never claimed again
+    Index(
+      "ix_job_queue_open_queue_visible_at", "queue", "visible_at",
+      postgresql_where=text("status IN ('Pending', 'Running')")
+    ),
+  )
+
+  id = Column(BigInteger, primary_key=True)
+  queue = Column(String(64), nullable=False)
+  payload = Column(JSONB, nullable=False)
+  status: JobStatus = Column(SQLAEnum(JobStatus), nullable=False, default=JobStatus.Pending)
+  attempts = Column(Integer, nullable=False, default=0)
+  max_attempts = Column(Integer, nullable=False)
+  visible_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
+  last_error = Column(Text, nullable=True)
+  created_at = Column(DateTime(timezone=True), default=func.now())
+  updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
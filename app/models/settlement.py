@@ -1,10 +1,14 @@
 from app.enums.settlement_status import SettlementStatus
 from ..db import Base
-from sqlalchemy import DateTime, Column, Integer, String, Text, Numeric, Date, Time, Enum as SQLAEnum
+from sqlalchemy import DateTime, Column, Index, Integer, String, Text, Numeric, Date, Time, Enum as SQLAEnum
 from sqlalchemy.sql import func
 
 class SettlementModel(Base):
   __tablename__ = "settlement"
+  __table_args__ = (
+    # Unfiltered pages are served by the unique settlement_date index
+    Index("ix_settlement_status_settlement_date", "settlement_status", "settlement_date"),
+  )
 
   id = Column(Integer, primary_key=True)
   name = Column(String(100))
@@ -0,0 +1,10 @@
+from ..db import Base
+from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy.sql import func
+
+class SyncStateModel(Base):
+  __tablename__ = "sync_state"
+
+  key = Column(String(100), primary_key=True)
+  value = Column(Text, nullable=True)
+  updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
@@ -0,0 +1,18 @@
+from ..db import Base
+from sqlalchemy import Column, Date, DateTime, Integer, Numeric, String, UniqueConstraint
+from sqlalchemy.sql import func
+
+class VisaNetExtractionModel(Base):
+  __tablename__ = "visa_net_extraction"
+  __table_args__ = (
+    UniqueConstraint("content_hash", "parser_version", name="uq_visa_net_extraction_content_hash_parser_version"),
+  )
+
+  id = Column(Integer, primary_key=True)
+  content_hash = Column(String(64), nullable=False)
+  parser_version = Column(String(64), nullable=False)
+  file_name = Column(String(255), nullable=True)
+  transaction_count = Column(Integer, nullable=False)
+  transaction_amount = Column(Numeric(precision=16, scale=2), nullable=False)
+  report_date = Column(Date, nullable=False)
+  created_at = Column(DateTime(timezone=True), default=func.now())
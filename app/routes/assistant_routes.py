@@ -49,7 +49,7 @@ async def get_assistant_by_id(key: int, db: AsyncSession = Depends(get_db)):
 @assistant_router.post('/')
 async def create_assistant(assistant: CreateAssistantDto, db: AsyncSession = Depends(get_db)):
   try:
-    created_assistant = openai_service.create_assistant(assistant=assistant)
+    created_assistant = await openai_service.create_assistant(assistant=assistant)
 
     assistant_model = AssistantModel(
       name=created_assistant.name, description=created_assistant.description, 
@@ -102,7 +102,7 @@ async def delete_assistant(key: int, db: AsyncSession = Depends(get_db)):
   if not assistant_model.external_id:
     return HTTPException(status_code=400, detail={'errors': [f"Invalid entity"]})
 
-  is_deleted = openai_service.delete_assistant(assistant_model.external_id)
+  is_deleted = await openai_service.delete_assistant(assistant_model.external_id)
 
   if not is_deleted:
     return HTTPException(status_code=500, detail={'errors': [f"Failed to delete assistant"]})
@@ -121,7 +121,7 @@ async def update_assistant_tools(key: int, db: AsyncSession = Depends(get_db)):
   if not assistant_model:
     return HTTPException(status_code=404, detail={'errors':["Invalid assistant"]})
   
-  openai_service.update_assistant_tools(assistant_model.external_id)
+  await openai_service.update_assistant_tools(assistant_model.external_id)
   return {"result":"success"}
 
 @assistant_router.get('/{key}/thread')
@@ -137,7 +137,7 @@ async def get_assistant_messages(key: int, db: AsyncSession = Depends(get_db)):
   if not assistant_model.thread_id:
     return HTTPException(status_code=500, detail={'errors': [f"Invalid entity"]})
   
-  messages = openai_service.get_messsages(assistant_model.thread_id)
+  messages = await openai_service.get_messsages(assistant_model.thread_id)
 
   return {"messages": messages}
 
@@ -155,7 +155,7 @@ async def create_and_run_thread_message(
     return {'errors':["Invalid assistant"]}
   
   if assistant_model.thread_id == None:
-    thread_id: str = openai_service.create_thread()
+    thread_id: str = await openai_service.create_thread()
 
     assistant_model.thread_id = thread_id
     await db.commit()
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 
 from app.dependencies import get_mail_client
 from app.services.mail.mail_service import MailService
+from app.workers.worker import drain_mail_backlog
 
 mail_router = APIRouter(prefix="/mail", tags=["mail"])
 
@@ -19,4 +20,13 @@ async def send_settlement_reply_mail(mail_client: MailService = Depends(get_mail
 @mail_router.post('/send-settlement-process-mail')
 async def send_settlement_process_mail(mail_client: MailService = Depends(get_mail_client)):
   await mail_client.send_settlement_process_mail()
-  return "Mail sent"
\ No newline at end of file
+  return "Mail sent"
+
+
+@mail_router.post('/backlog/drain')
+async def drain_backlog():
+  """
+  Catch up on inbox messages received since the last backlog checkpoint
+  """
+  drained = await drain_mail_backlog()
+  return {"drained": drained}
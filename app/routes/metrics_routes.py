@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+
+from app.utils.metrics import metrics
+
+metrics_router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@metrics_router.get('/')
+def get_metrics():
+  """
+  Snapshot of the in process counters and timings
+  """
+  return metrics.snapshot()
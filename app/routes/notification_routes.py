@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Request
-from app.workers.shared_queue import email_event_queue
-from app.dtos.notifications.notification_dto import NotificationDto
+import time
+from fastapi import APIRouter, Request, Response
+from app.settings import settings
+from app.utils.metrics import metrics
+from app.workers.notification_intake import notification_intake
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -11,26 +13,19 @@ notification_router = APIRouter(prefix="/notification", tags=["notification"])
 async def notification_webhook(request: Request):
   if "validationToken" in request.query_params:
         return request.query_params["validationToken"]
-  
-  body = await request.json()
-  dto = NotificationDto.model_validate(body, strict=False)
 
-  if not dto or not dto.value or len(dto.value) == 0:
-     return "Recevied"
+  # Acknowledged as soon as the raw body is handed over, Graph redelivers slow acknowledgements.
+  # Notifications lost after the 202 are recovered by the inbox delta poller, see NotificationIntake
+  started_at = time.perf_counter()
+  body = await request.body()
 
-  for notification in dto.value:
-    try:
-       if not notification.resourceData or not notification.resourceData.id:
-          continue
-       if notification.changeType != "created" or notification.clientState != "wipay_automation_api":
-          continue
-       email_id = notification.resourceData.id
-       await email_event_queue.put(email_id)
-    except Exception as e:
-     _logger.error("Failed to process event", exc_info=True)
+  if not notification_intake.submit(body):
+     _logger.warning("Notification intake is full or stopped, asking for redelivery")
+     return Response(status_code=503, headers={"Retry-After": str(settings.NOTIFICATION_RETRY_AFTER_SECONDS)})
 
-  return ""
+  metrics.observe("notifications.ack", time.perf_counter() - started_at)
+  return Response(status_code=202)
 
 @notification_router.post("/subscribe")
 def create_webhook():
-  return ""
\ No newline at end of file
+  return ""
@@ -0,0 +1,53 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies import get_db, get_report_service
+from app.dtos.reconciliation.reconcile_settlement_dto import ReconcileSettlementDto
+from app.models.assistant import AssistantModel
+from app.services.ai import openai_service
+from app.services.reconciliation.reconciliation_service import ReconciliationService, build_discrepancy_message
+from app.services.report_processing.report_service import ReportService
+import logging
+
+logger = logging.getLogger(__name__)
+
+reconciliation_router = APIRouter(prefix="/reconciliation", tags=["reconciliation"])
+
+@reconciliation_router.post('/')
+async def reconcile_settlement(
+  dto: ReconcileSettlementDto,
+  db: AsyncSession = Depends(get_db),
+  report_service: ReportService = Depends(get_report_service)
+):
+  """
+  Reconcile a VisaNet report against the FAC report in process, handing off to the assistant only when there is a discrepancy
+  """
+  reconciliation_service = ReconciliationService(db, report_service)
+
+  try:
+    result = await reconciliation_service.reconcile(dto.visa_net_report_file_name, email_id=dto.email_id, attachment_id=dto.attachment_id)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail={'errors': [str(e)]})
+
+  if result.is_matched or result.is_already_completed or dto.assistant_id is None:
+    return result
+
+  assistant_model: Optional[AssistantModel] = await db.get(AssistantModel, dto.assistant_id)
+
+  if not assistant_model:
+    raise HTTPException(status_code=404, detail={'errors': [f"Assistant with id {dto.assistant_id} not found"]})
+
+  if assistant_model.thread_id == None:
+    assistant_model.thread_id = await openai_service.create_thread()
+    await db.commit()
+    await db.refresh(assistant_model)
+
+  logger.info(f"Discrepancy found for {dto.visa_net_report_file_name}. Handing off to assistant {assistant_model.id}")
+
+  await openai_service.create_message(assistant_model.thread_id, message=build_discrepancy_message(result), files=None)
+
+  stream = openai_service.run_thread(thread_id=assistant_model.thread_id, assistant_id=assistant_model.external_id)
+
+  return StreamingResponse(stream, media_type="text/event-stream")
@@ -28,7 +28,7 @@ async def queryAI(
     kwargs["file_data"] = file_data
       
 
-  return openai_service.queryWithAI(message, **kwargs)
+  return await openai_service.queryWithAI(message, **kwargs)
 
 @responses_router.post('/visa-net-file-check')
 async def visa_net_file_check(
@@ -43,4 +43,4 @@ async def visa_net_file_check(
   base64_string = base64.b64encode(file_bytes).decode("utf-8")
   file_data = f"data:{file_type};base64,{base64_string}"
 
-  return openai_service.isVisaNetSettlementFile(file_data=file_data, filename=uploaded_file.filename)
\ No newline at end of file
+  return await openai_service.isVisaNetSettlementFile(file_data=file_data, filename=uploaded_file.filename)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import AsyncIterator, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies import get_db, get_db_context
+from app.dtos.settlement.settlement_dto import SettlementDto, SettlementPageDto
+from app.dtos.settlement.settlement_filter_dto import SettlementFilterDto
+from app.enums.settlement_status import SettlementStatus
+from app.models.settlement import SettlementModel
+from app.services.settlement_processing.settlement_service import SettlementService
+
+settlement_router = APIRouter(prefix="/settlement", tags=["settlement"])
+
+
+def get_settlement_filter(
+  status: Optional[str] = None, date_from: Optional[date] = None, date_to: Optional[date] = None
+) -> SettlementFilterDto:
+  settlement_status = None
+  if status:
+    try:
+      settlement_status = SettlementStatus[status]
+    except KeyError:
+      raise HTTPException(status_code=400, detail={'errors': [f"Unknown status {status}, expected one of {[x.name for x in SettlementStatus]}"]})
+
+  return SettlementFilterDto(status=settlement_status, date_from=date_from, date_to=date_to)
+
+
+@settlement_router.get('/')
+async def index(
+  filter_dto: SettlementFilterDto = Depends(get_settlement_filter),
+  cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=500), order: Literal["asc", "desc"] = "asc",
+  db: AsyncSession = Depends(get_db)
+) -> SettlementPageDto:
+  """
+  Settlements filtered by status and settlement date range, paged with the next_cursor of the previous page
+  """
+  try:
+    settlements, next_cursor = await SettlementService(db).list_settlements(
+      filter_dto, cursor=cursor, limit=limit, descending=order == "desc"
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail={'errors': [str(e)]})
+
+  return SettlementPageDto(items=[SettlementDto.from_model(x) for x in settlements], next_cursor=next_cursor)
+
+
+@settlement_router.get('/export')
+async def export(
+  filter_dto: SettlementFilterDto = Depends(get_settlement_filter), format: Literal["ndjson", "csv"] = "ndjson"
+):
+  """
+  Streams every matching settlement as NDJSON or CSV without loading them into memory
+  """
+  async def rows() -> AsyncIterator[dict]:
+    # The session is opened here so it stays alive while the response streams
+    async with get_db_context() as db:
+      async for settlement in SettlementService(db).stream_settlements(filter_dto):
+        yield SettlementDto.from_model(settlement).model_dump(mode="json")
+
+  if format == "csv":
+    return StreamingResponse(
+      _to_csv(rows()), media_type="text/csv",
+      headers={"Content-Disposition": "attachment; filename=settlements.csv"}
+    )
+
+  return StreamingResponse((json.dumps(x) + "\n" async for x in rows()), media_type="application/x-ndjson")
+
+
+@settlement_router.get('/{key}')
+async def get_settlement_by_id(key: int, db: AsyncSession = Depends(get_db)) -> SettlementDto:
+  settlement_model: SettlementModel | None = await db.get(SettlementModel, key)
+
+  if not settlement_model:
+    raise HTTPException(status_code=404, detail={'errors': [f"Settlement {key} not found"]})
+
+  return SettlementDto.from_model(settlement_model)
+
+
+async def _to_csv(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+  buffer = io.StringIO()
+  writer = csv.DictWriter(buffer, fieldnames=list(SettlementDto.model_fields))
+  writer.writeheader()
+
+  async for row in rows:
+    writer.writerow(row)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+  if buffer.tell():
+    yield buffer.getvalue()
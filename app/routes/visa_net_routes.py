@@ -0,0 +1,33 @@
+from pathlib import Path
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.dependencies import get_report_service
+from app.dtos.visa_net.batch_extract_visa_net_dto import BatchExtractVisaNetDto
+from app.services.report_processing.report_service import ReportService
+from app.services.report_processing.visa_net_batch_service import extract_visa_net_batch
+
+visa_net_router = APIRouter(prefix="/visa-net", tags=["visa-net"])
+
+@visa_net_router.post('/batch-extract')
+async def batch_extract(dto: BatchExtractVisaNetDto, report_service: ReportService = Depends(get_report_service)):
+  """
+  Extract VisaNet totals for many files, streamed back as NDJSON as each file completes
+  """
+  base_folder = Path(report_service.get_visa_net_file_path("")).resolve()
+
+  file_paths: List[Path] = []
+  if dto.file_names:
+    file_paths = [(base_folder / x).resolve() for x in dto.file_names]
+  else:
+    directory = (base_folder / (dto.directory or "")).resolve()
+    if not directory.is_relative_to(base_folder) or not directory.is_dir():
+      raise HTTPException(status_code=400, detail={'errors': [f"Invalid directory {dto.directory}"]})
+    file_paths = sorted(x for x in directory.iterdir() if x.suffix.lower() == ".pdf")
+
+  invalid = [x.name for x in file_paths if not x.is_relative_to(base_folder) or not x.is_file()]
+  if invalid:
+    raise HTTPException(status_code=400, detail={'errors': [f"Invalid file {x}" for x in invalid]})
+
+  return StreamingResponse(extract_visa_net_batch(file_paths), media_type="application/x-ndjson")
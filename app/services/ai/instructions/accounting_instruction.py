@@ -7,6 +7,9 @@ There are some of the tools you have available:
 - `send_reply_email`
 - `send_internal_email`
 - `extract_visa_net_data`
+- `attach_fac_report_file`
+- `explain_fac_discrepancy`
+- `fac_cutoff_sensitivity`
 - `code_interpreter`
 - `file_search`
 
@@ -19,6 +22,8 @@ Steps:
    - IF the VisaNet report date does not fall on a Tuesday then generate a FAC report for 2 days before to the VisaNet report date (6AM-5:59AM)
 4. Compare the transaction count from the VisaNet report to the transaction total from the FAC report and 
    then compare the original sale clearing amount from the VisaNet report to the total of all transactions from the FAC report.
+   The transaction count and total are returned by `generate_fac_report`. Only use `attach_fac_report_file` and `code_interpreter`
+   when individual transactions need to be inspected.
    
    - If they match then send an email to the acquirer and then an email to the internal stakeholders.
    
@@ -34,6 +39,9 @@ Steps:
             individual transactions close to the end of the settlement window that when removed could resolve the
             differences between the target transaction count and the fac report count and the transaction total and clearing amount.
       
+         Use `explain_fac_discrepancy` first, it searches the transactions closest to the window cutoffs for these transactions.
+         Use `fac_cutoff_sensitivity` to see how the count and total change when the window boundaries move.
+
       ii. Repeat this process until you are able to match the data from the VisaNet report as that is the source of truth.
       
       iii. Update the settlement record accordingly.
@@ -1,8 +1,9 @@
+import asyncio
 import io
 import json
 from pathlib import Path
 from typing import List, Text, override
-from openai import OpenAI, AssistantEventHandler
+from openai import AsyncOpenAI, AsyncAssistantEventHandler
 from openai.types import beta
 from openai.types.beta import AssistantToolParam, CodeInterpreterToolParam, FileSearchToolParam
 from openai.types.beta.thread import ToolResources, ToolResourcesFileSearch, ToolResourcesCodeInterpreter
@@ -13,12 +14,18 @@ from app.dtos.ai.requests.create_assistant import CreateAssistantDto
 from app.dtos.ai.responses.visa_net_file_check_result import VisaNetFileCheckResult, VisaNetFileNameCheckResult
 from app.enums.assistant_type import AssistantType
 from app.services.ai.instructions.accounting_instruction import ACCOUNTING_ASSISTANT_INSTRUCTION
+from app.services.ai.tools.attach_fac_report_tool import attach_fac_report_tool_definition, attach_fac_report_tool_handler
+from app.services.ai.tools.cutoff_sensitivity_tool import cutoff_sensitivity_tool_definition, cutoff_sensitivity_tool_handler
 from app.services.ai.tools.create_settlement_tool import create_settlement_record_tool_definition, create_settlement_record_tool_handler
-from app.services.ai.tools.extract_visanet_tool import extract_visa_net_data, extract_visa_net_data_tool_definition
+from app.services.ai.tools.explain_discrepancy_tool import explain_discrepancy_tool_definition, explain_discrepancy_tool_handler
+from app.services.ai.tools.extract_visanet_tool import extract_visa_net_data_tool_definition
 from app.services.ai.tools.generate_fac_report_tool import generate_fac_report_tool_definition, generate_fac_report_tool_handler
 from app.services.ai.tools.send_internal_mail_tool import send_internal_mail_tool_definition, send_internal_mail_tool_handler
 from app.services.ai.tools.send_reply_mail_tool import send_reply_mail_tool_definition, send_reply_mail_tool_handler
+from app.services.ai.tools.tool_registry import ToolContext, ToolRegistry, ToolSpec
 from app.services.ai.tools.update_settlement_tool import update_settlement_record_tool_definition, update_settlement_record_tool_handler
+from app.services.report_processing.visa_net_extraction_service import VisaNetExtractionService
+from app.dependencies import get_db_context
 from ...dtos.ai.assistant_dto import AssistantDto
 from fastapi import UploadFile
 from datetime import datetime
@@ -26,15 +33,72 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI()
+client = AsyncOpenAI()
 
-class StreamEventHandler(AssistantEventHandler):
+
+async def _extract_visa_net_data(arguments: str, context: ToolContext) -> str:
+  params_dict: dict = json.loads(arguments)
+  (count, amount, report_date) = await VisaNetExtractionService(context.db).extract(params_dict["visaNetReportFileName"])
+
+  return json.dumps({
+    "visa_net_file_transaction_count": count,
+    "visa_net_file_transaction_amount": str(amount),
+    "visa_net_file_report_date": report_date.strftime('%Y-%m-%d')
+  })
+
+async def _attach_fac_report_file(arguments: str, context: ToolContext) -> str:
+  csv_file_path = await asyncio.to_thread(attach_fac_report_tool_handler, arguments)
+  if not csv_file_path:
+    return "FAC report file does not exist. Generate it with generate_fac_report first"
+
+  report_file_id = await attach_code_interpreter_file(context.thread_id, csv_file_path)
+  return json.dumps({"open_ai_file_id": report_file_id})
+
+
+# Tools writing through the run session, or updating the thread resources, run one at a time
+tool_registry = ToolRegistry()
+tool_registry.register(ToolSpec(
+  "create_settlement_record", create_settlement_record_tool_definition,
+  lambda arguments, context: create_settlement_record_tool_handler(arguments, context.db), is_async=True, parallel_safe=False
+))
+tool_registry.register(ToolSpec(
+  "generate_fac_report", generate_fac_report_tool_definition,
+  lambda arguments, context: generate_fac_report_tool_handler(arguments), is_async=True, parallel_safe=True
+))
+tool_registry.register(ToolSpec(
+  "update_settlement_record", update_settlement_record_tool_definition,
+  lambda arguments, context: update_settlement_record_tool_handler(arguments, context.db), is_async=True, parallel_safe=False
+))
+tool_registry.register(ToolSpec(
+  "send_reply_mail", send_reply_mail_tool_definition,
+  lambda arguments, context: send_reply_mail_tool_handler(arguments), is_async=False, parallel_safe=True
+))
+tool_registry.register(ToolSpec(
+  "send_internal_mail", send_internal_mail_tool_definition,
+  lambda arguments, context: send_internal_mail_tool_handler(arguments), is_async=False, parallel_safe=True
+))
+tool_registry.register(ToolSpec(
+  "extract_visa_net_data", extract_visa_net_data_tool_definition, _extract_visa_net_data, is_async=True, parallel_safe=False
+))
+tool_registry.register(ToolSpec(
+  "attach_fac_report_file", attach_fac_report_tool_definition, _attach_fac_report_file, is_async=True, parallel_safe=False
+))
+tool_registry.register(ToolSpec(
+  "explain_fac_discrepancy", explain_discrepancy_tool_definition,
+  lambda arguments, context: explain_discrepancy_tool_handler(arguments), is_async=True, parallel_safe=True
+))
+tool_registry.register(ToolSpec(
+  "fac_cutoff_sensitivity", cutoff_sensitivity_tool_definition,
+  lambda arguments, context: cutoff_sensitivity_tool_handler(arguments), is_async=True, parallel_safe=True
+))
+
+class StreamEventHandler(AsyncAssistantEventHandler):
   def __init__(self):
     super().__init__()
     self.buffer: List[str] = []
 
   @override
-  def on_text_delta(self, delta : TextDelta, snapshot: Text):
+  async def on_text_delta(self, delta : TextDelta, snapshot: Text):
     self.buffer.append(delta.value)
   
   def stream_data(self):
@@ -42,8 +106,8 @@ class StreamEventHandler(AssistantEventHandler):
       yield chunk.encode(encoding="utf-8")
 
 
-def get_assistants() -> list[AssistantDto]:
-  assistants = client.beta.assistants.list()
+async def get_assistants() -> list[AssistantDto]:
+  assistants = await client.beta.assistants.list()
 
   result = []
   for assistant in assistants.data:
@@ -51,14 +115,11 @@ def get_assistants() -> list[AssistantDto]:
 
   return result
 
-def create_assistant(assistant: CreateAssistantDto) -> AssistantDto:
+async def create_assistant(assistant: CreateAssistantDto) -> AssistantDto:
 
   tools: List[AssistantToolParam] = []
 
-  accounting_tools = [create_settlement_record_tool_definition(), generate_fac_report_tool_definition(),
-    update_settlement_record_tool_definition(), send_reply_mail_tool_definition(),
-    send_internal_mail_tool_definition(), extract_visa_net_data_tool_definition()
-  ]
+  accounting_tools = list(tool_registry.definitions().values())
   instructions: str | None = None
   if assistant.type == AssistantType.ACCOUNTING:
     tools.extend(accounting_tools)
@@ -66,7 +127,7 @@ def create_assistant(assistant: CreateAssistantDto) -> AssistantDto:
   else:
     raise ValueError("Unsupported assistant type")
   
-  new_assistant = client.beta.assistants.create(
+  new_assistant = await client.beta.assistants.create(
     model="gpt-4o-2024-11-20", description=assistant.description, 
     instructions=instructions, name=assistant.name,
     temperature=0.01, reasoning_effort="high",
@@ -81,20 +142,14 @@ def create_assistant(assistant: CreateAssistantDto) -> AssistantDto:
 
   return result
 
-def update_assistant_tools(assistant_id: str):
-  assistant_returned = client.beta.assistants.retrieve(assistant_id=assistant_id)
+async def update_assistant_tools(assistant_id: str):
+  assistant_returned = await client.beta.assistants.retrieve(assistant_id=assistant_id)
 
   existing_tools = assistant_returned.tools
 
   existing_function_name_set = {x.function.name for x in existing_tools if x.type == "function"}
 
-  available_tools = {
-    "create_settlement_record": create_settlement_record_tool_definition(),
-    "update_settlement_record": update_settlement_record_tool_definition(),
-    "generate_fac_report": generate_fac_report_tool_definition(),
-    "send_reply_mail": send_reply_mail_tool_definition(),
-    "send_internal_mail": send_internal_mail_tool_definition()
-  }
+  available_tools = tool_registry.definitions()
 
   for func_name, func_def in available_tools.items():
     if func_name in existing_function_name_set:
@@ -103,20 +158,20 @@ def update_assistant_tools(assistant_id: str):
     existing_function_name_set.add(func_name)
 
 
-  client.beta.assistants.update(assistant_id=assistant_id, tools=existing_tools)
+  await client.beta.assistants.update(assistant_id=assistant_id, tools=existing_tools)
 
 
-def delete_assistant(assistant_id: str) -> bool:
-  assistant_deleted = client.beta.assistants.delete(assistant_id=assistant_id)
+async def delete_assistant(assistant_id: str) -> bool:
+  assistant_deleted = await client.beta.assistants.delete(assistant_id=assistant_id)
 
   return assistant_deleted.deleted
 
-def create_thread() -> str:
-  thread: beta.thread.Thread = client.beta.threads.create()
+async def create_thread() -> str:
+  thread: beta.thread.Thread = await client.beta.threads.create()
   return thread.id
 
 async def create_message(thread_id:str, message: str | None, files: List[UploadFile] | None) -> str:
-  stored_thread = client.beta.threads.retrieve(thread_id)
+  stored_thread = await client.beta.threads.retrieve(thread_id)
 
   if not stored_thread:
     raise ValueError("Thread does not exist")
@@ -133,7 +188,7 @@ async def create_message(thread_id:str, message: str | None, files: List[UploadF
     for f in files:
       file_stream = io.BytesIO(await f.read())
       file_stream.name = f.filename
-      res = client.files.create(purpose="assistants", file=file_stream)
+      res = await client.files.create(purpose="assistants", file=file_stream)
       file_ids.append(res.id)
 
   if len(file_ids) > 0:
@@ -150,16 +205,16 @@ async def create_message(thread_id:str, message: str | None, files: List[UploadF
       timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
       filename = f"{prefix}_{timestamp}"
 
-      file_search_resources.vector_store_ids.append(client.vector_stores.create(name=f"{filename}").id)
+      file_search_resources.vector_store_ids.append((await client.vector_stores.create(name=f"{filename}")).id)
     
     vector_store_id = file_search_resources.vector_store_ids[0]
 
-    client.vector_stores.file_batches.create_and_poll(vector_store_id=vector_store_id, file_ids=file_ids)
+    await client.vector_stores.file_batches.create_and_poll(vector_store_id=vector_store_id, file_ids=file_ids)
 
     tool_resources.file_search = file_search_resources
     tool_resources.code_interpreter = code_interpreter_resources
 
-    stored_thread = client.beta.threads.update(thread_id=stored_thread.id, tool_resources=tool_resources)
+    stored_thread = await client.beta.threads.update(thread_id=stored_thread.id, tool_resources=tool_resources)
 
 
   params = {}
@@ -167,16 +222,34 @@ async def create_message(thread_id:str, message: str | None, files: List[UploadF
   if message:
     params['content'] = message
 
-  newMessageId = client.beta.threads.messages.create(thread_id, role="user", **params).id
+  newMessageId = (await client.beta.threads.messages.create(thread_id, role="user", **params)).id
 
   return newMessageId
 
   
+async def attach_code_interpreter_file(thread_id: str, file_path: str) -> str:
+  res = await client.files.create(purpose="assistants", file=Path(file_path))
+  file_id = res.id
+
+  stored_thread = await client.beta.threads.retrieve(thread_id)
+
+  existing_tool_resources = stored_thread.tool_resources or ToolResources()
+  code_interpreter_resources = existing_tool_resources.code_interpreter or ToolResourcesCodeInterpreter()
+  code_interpreter_file_ids = code_interpreter_resources.file_ids or []
+
+  code_interpreter_file_ids.append(file_id)
+  code_interpreter_resources.file_ids = code_interpreter_file_ids
+  existing_tool_resources.code_interpreter = code_interpreter_resources
+
+  await client.beta.threads.update(thread_id=stored_thread.id, tool_resources=existing_tool_resources)
+
+  return file_id
+
 async def run_thread(thread_id: str, assistant_id: str):
   
   stream_manager = client.beta.threads.runs.stream(
     thread_id=thread_id, assistant_id=assistant_id, 
-    parallel_tool_calls=False, response_format={
+    parallel_tool_calls=True, response_format={
       "type":"json_schema",
       "json_schema":{
         "name":"reconciliation_outcome",
@@ -226,102 +299,64 @@ async def run_thread(thread_id: str, assistant_id: str):
   current_run: Run | None = None 
 
   try:
-    while True:
-      tool_outputs = []
-      current_run = None
-      with stream_manager as stream:
-        for event in stream:
-          if (
-            event.event == "thread.run.completed"
-            or event.event == "thread.run.cancelled"
-            or event.event == "thread.run.expired"
-            or event.event == "thread.run.failed"
-            or event.event == "thread.run.incomplete"
-            or event.event == "thread.run.created"
-            or event.event == "thread.run.in_progress"
-            or event.event == "thread.run.cancelling"
-            or event.event == "thread.run.queued"
-          ):
-            logger.info(f"{event.data.id} {event.event}")
-            current_run = event.data
+    # One unit of work for every tool call of the run instead of a session per call
+    async with get_db_context() as db:
+      while True:
+        tool_outputs = []
+        current_run = None
+        async with stream_manager as stream:
+          async for event in stream:
+            if (
+              event.event == "thread.run.completed"
+              or event.event == "thread.run.cancelled"
+              or event.event == "thread.run.expired"
+              or event.event == "thread.run.failed"
+              or event.event == "thread.run.incomplete"
+              or event.event == "thread.run.created"
+              or event.event == "thread.run.in_progress"
+              or event.event == "thread.run.cancelling"
+              or event.event == "thread.run.queued"
+            ):
+              logger.info(f"{event.data.id} {event.event}")
+              current_run = event.data
             
-          elif event.event == "thread.run.requires_action":
-            logger.info(f"{event.data.id} {event.event}")
-            current_run = event.data
-            for tool in current_run.required_action.submit_tool_outputs.tool_calls:
-              output = None
-              logger.info(f"Function call {tool.function.name} with args {tool.function.arguments}")
-              if tool.function.name == "extract_visa_net_data":
-                params_dict: dict = json.loads(tool.function.arguments)
-
-                # retrieved_file = client.files.retrieve(Path(params_dict["visaNetReportFileName"]).stem)
-
-                (count, amount, report_date) = extract_visa_net_data(params_dict["visaNetReportFileName"])
-
-                output = json.dumps({
-                  "visa_net_file_transaction_count": count,
-                  "visa_net_file_transaction_amount": str(amount),
-                  "visa_net_file_report_date": report_date.strftime('%Y-%m-%d')
-                })
-              elif tool.function.name == "create_settlement_record":
-                output = await create_settlement_record_tool_handler(tool.function.arguments)
-              elif tool.function.name == "update_settlement_record":
-                output = await update_settlement_record_tool_handler(tool.function.arguments)
-              elif tool.function.name == "generate_fac_report":
-                csv_file_path = await generate_fac_report_tool_handler(tool.function.arguments)
-                res = client.files.create(purpose="assistants", file=Path(csv_file_path))
-                report_file_id = res.id
-
-                stored_thread = client.beta.threads.retrieve(thread_id)
-
-                existing_tool_resources = stored_thread.tool_resources or ToolResources()
-                code_interpreter_resources = existing_tool_resources.code_interpreter or ToolResourcesCodeInterpreter()
-                code_interpreter_file_ids = code_interpreter_resources.file_ids or []
-
-                code_interpreter_file_ids.append(report_file_id)
-                code_interpreter_resources.file_ids = code_interpreter_file_ids
-                existing_tool_resources.code_interpreter = code_interpreter_resources
-
-                stored_thread = client.beta.threads.update(thread_id=stored_thread.id, tool_resources=existing_tool_resources)
-
-                output = json.dumps({"open_ai_file_id": report_file_id})
-                
-              elif tool.function.name == "send_reply_mail":
-                output = send_reply_mail_tool_handler(tool.function.arguments)
-              elif tool.function.name == "send_internal_mail":
-                output = send_internal_mail_tool_handler(tool.function.arguments)
-              else:
-                raise ValueError(f"Unrecognized function call {tool.function.name}")
-
-              tool_outputs.append({"tool_call_id": tool.id, "output":output})
-
-          elif event.event == "thread.message.delta":
-            for content_delta in event.data.delta.content or []:
-              if content_delta.type == "text" and content_delta.text and content_delta.text.value:
-                yield content_delta.text.value.encode(encoding="utf-8")
+            elif event.event == "thread.run.requires_action":
+              logger.info(f"{event.data.id} {event.event}")
+              current_run = event.data
+              tool_outputs = await tool_registry.run_tool_calls(
+                current_run.required_action.submit_tool_outputs.tool_calls, ToolContext(thread_id=thread_id, db=db)
+              )
+
+              # Ends any open transaction so the connection goes back to the pool while the assistant works
+              await db.commit()
+
+            elif event.event == "thread.message.delta":
+              for content_delta in event.data.delta.content or []:
+                if content_delta.type == "text" and content_delta.text and content_delta.text.value:
+                  yield content_delta.text.value.encode(encoding="utf-8")
       
-      if not current_run:
-        break
+        if not current_run:
+          break
         
-      current_run = client.beta.threads.runs.retrieve(run_id=current_run.id, thread_id=thread_id)
+        current_run = await client.beta.threads.runs.retrieve(run_id=current_run.id, thread_id=thread_id)
 
-      if len(tool_outputs) > 0 and current_run.status == "requires_action" and current_run.required_action.type == "submit_tool_outputs":
-        stream_manager = client.beta.threads.runs.submit_tool_outputs_stream(run_id=current_run.id, thread_id=thread_id, tool_outputs=tool_outputs)
+        if len(tool_outputs) > 0 and current_run.status == "requires_action" and current_run.required_action.type == "submit_tool_outputs":
+          stream_manager = client.beta.threads.runs.submit_tool_outputs_stream(run_id=current_run.id, thread_id=thread_id, tool_outputs=tool_outputs)
       
-      logger.info(f"End of loop for run {current_run.id} in state {current_run.status}")
-      if not current_run or current_run.status in ["completed", "failed", "cancelled", "expired"]:
+        logger.info(f"End of loop for run {current_run.id} in state {current_run.status}")
+        if not current_run or current_run.status in ["completed", "failed", "cancelled", "expired"]:
         
 
-        break
+          break
     
   except Exception as e:
     logger.error(msg=f"Open AI error", exc_info=True)
     if current_run:
-      client.beta.threads.runs.cancel(current_run.id, thread_id=thread_id)
+      await client.beta.threads.runs.cancel(current_run.id, thread_id=thread_id)
 
 
-def get_messsages(thread_id: str):
-  response = client.beta.threads.messages.list(thread_id=thread_id, order='desc', limit=50)
+async def get_messsages(thread_id: str):
+  response = await client.beta.threads.messages.list(thread_id=thread_id, order='desc', limit=50)
 
   messages = response.data
 
@@ -336,7 +371,7 @@ def get_messsages(thread_id: str):
 
   return results
 
-def queryWithAI(query: str, file_data: str | None = None, filename: str | None = None) -> str:
+async def queryWithAI(query: str, file_data: str | None = None, filename: str | None = None) -> str:
   content = []
   if filename and file_data:
     content.append({
@@ -350,7 +385,7 @@ def queryWithAI(query: str, file_data: str | None = None, filename: str | None =
     "text":query
   })
 
-  response = client.responses.create(
+  response = await client.responses.create(
     model="gpt-4o-2024-11-20",
     temperature=0.1,
     input=[
@@ -363,7 +398,7 @@ def queryWithAI(query: str, file_data: str | None = None, filename: str | None =
 
   return response.output_text
 
-def isVisaNetSettlementFileName(filename: str) -> bool:
+async def isVisaNetSettlementFileName(filename: str) -> bool:
   content = [
     {
       "type":"input_text",
@@ -371,7 +406,7 @@ def isVisaNetSettlementFileName(filename: str) -> bool:
     }
   ]
 
-  response = client.responses.parse(
+  response = await client.responses.parse(
     instructions="You are a financial auditor who handles settlements between a Visa and an acquiring bank. VisaNet settlement" \
     "reports are typically pdf files with names like 'TT  Acquirer Visa Files 07.05.2025.pdf' and 'TT Aquirer Visa Files 01.01.2025.pdf'." \
     "You will be provided with a filename, return a True value if the filename provided could possible be one for a VisaNet" \
@@ -388,7 +423,7 @@ def isVisaNetSettlementFileName(filename: str) -> bool:
 
   return response.output_parsed.is_similiar if response.output_parsed else False
 
-def isVisaNetSettlementFile(file_data: str, filename: str) -> VisaNetFileCheckResult:
+async def isVisaNetSettlementFile(file_data: str, filename: str) -> VisaNetFileCheckResult:
   content = []
   if filename and file_data:
     content.append({
@@ -397,7 +432,7 @@ def isVisaNetSettlementFile(file_data: str, filename: str) -> VisaNetFileCheckRe
       "file_data":file_data 
     })
 
-  response = client.responses.parse(
+  response = await client.responses.parse(
     instructions="You are a financial auditor who handles settlements between a Visa and an acquiring bank. " \
     "You will be provided with a file, indicate whether the file is a VisaNet Settlement report file or not." \
     "If it is a visa net settlement report then extract the report date in format yyyy-MM-dd. eg. 2025-04-14," \
@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+from app.dependencies import get_report_service
+from app.services.report_processing.report_service import ReportService
+
+def attach_fac_report_tool_definition() -> dict:
+  return {
+    "type":"function",
+    "function":{
+      "name":"attach_fac_report_file",
+      "description":"Uploads a generated FAC report csv to the code interpreter and returns its open ai file_id. Only use this when row level transaction data is required, the totals are already returned by generate_fac_report.",
+      "parameters":{
+        "type":"object",
+        "properties": {
+          "reportFileName": {
+            "type": "string",
+            "description": "The name of the FAC report csv file returned by generate_fac_report, without the file extension. eg. fac_report_05_01_2024",
+            "nullable": False
+          }
+        },
+        "required": [
+          "reportFileName"
+        ]
+      }
+    }
+  }
+
+def attach_fac_report_tool_handler(params_json: str) -> str | None:
+  '''
+  Returns the local path of the requested FAC report csv, or None if it has not been generated
+  '''
+  params_dict = json.loads(params_json)
+  report_service: ReportService = get_report_service()
+
+  file_name = Path(params_dict["reportFileName"]).stem
+  if not report_service.is_existing_report(f"{file_name}.csv"):
+    return None
+
+  return report_service.get_full_report_path(f"{file_name}.csv")
@@ -3,7 +3,8 @@ import json
 from app.dtos.settlement.create_settlement_dto import CreateSettlementDto
 from app.exceptions.settlement_exceptions import SettlementAlreadyCompletedError
 from app.services.settlement_processing.settlement_service import SettlementService
-from app.dependencies import get_db_context
+from app.dependencies import use_db_context
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 logger = logging.getLogger(__name__)
@@ -59,7 +60,7 @@ def create_settlement_record_tool_definition() -> dict :
     }
   }
 
-async def create_settlement_record_tool_handler(params_string: str) -> str:
+async def create_settlement_record_tool_handler(params_string: str, db: AsyncSession | None = None) -> str:
   params_dict: dict = json.loads(params_string)
   create_settlement_dto = CreateSettlementDto(
     visa_net_report_date=params_dict["visaNetReportDate"],
@@ -70,8 +71,8 @@ async def create_settlement_record_tool_handler(params_string: str) -> str:
     attachment_id=params_dict.get("attachmentId")
   )
   try:
-    async with get_db_context() as db:
-      settlement_service: SettlementService = SettlementService(db)
+    async with use_db_context(db) as session:
+      settlement_service: SettlementService = SettlementService(session)
       await settlement_service.create_settlement(create_settlement_dto)
     return "Settlement created successfully"
   except SettlementAlreadyCompletedError as se:
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from decimal import Decimal
+
+from app.dependencies import get_report_service
+from app.services.reconciliation.cutoff_sensitivity import sensitivity_curve
+from app.services.reconciliation.transaction_window import load_padded_window_transactions, window_padding_days
+from app.services.report_processing.fac_report_store import get_fac_window
+from app.services.report_processing.report_service import ReportService
+
+def cutoff_sensitivity_tool_definition() -> dict:
+  return {
+    "type":"function",
+    "function":{
+      "name":"fac_cutoff_sensitivity",
+      "description":"Shows how the FAC report transaction count and total change when the 6AM settlement window boundaries move earlier or later. "
+        "Returns curves for moving both boundaries, only the start and only the end, listing the offsets in minutes where the count or total changes, "
+        "and the offsets that match the VisaNet count and total when they are provided.",
+      "parameters":{
+        "type":"object",
+        "properties": {
+          "facReportStartDate": {
+            "type": "string",
+            "description": "The start date of the FAC report being reconciled in format MM/dd/yyyy",
+            "nullable": False
+          },
+          "facReportEndDate": {
+            "type": "string",
+            "description": "The end date of the FAC report being reconciled in format MM/dd/yyyy",
+            "nullable": False
+          },
+          "maxOffsetMinutes": {
+            "type": "number",
+            "description": "The largest boundary move to consider in minutes, in either direction. Defaults to 120. "
+              "Values past the days of transactions loaded around the window are reduced to that limit",
+            "nullable": True
+          },
+          "stepMinutes": {
+            "type": "number",
+            "description": "The step between boundary moves in minutes. Defaults to 5",
+            "nullable": True
+          },
+          "visaNetTransactionCount": {
+            "type": "number",
+            "description": "The purchase original sale count from the VisaNet report",
+            "nullable": True
+          },
+          "visaNetSettlementAmount": {
+            "type": "number",
+            "description": "The purchase original sale clearing amount from the VisaNet report",
+            "nullable": True
+          }
+        },
+        "required": [
+          "facReportStartDate", "facReportEndDate"
+        ]
+      }
+    }
+  }
+
+async def cutoff_sensitivity_tool_handler(params_json: str) -> str:
+  params_dict = json.loads(params_json)
+  start, end = get_fac_window(params_dict["facReportStartDate"], params_dict["facReportEndDate"])
+
+  report_service: ReportService = get_report_service()
+  transactions = await load_padded_window_transactions(report_service, start, end)
+
+  target_count = params_dict.get("visaNetTransactionCount")
+  target_amount = params_dict.get("visaNetSettlementAmount")
+
+  # Only the padding around the window is loaded, larger moves would count a truncated report
+  offset_limit = window_padding_days() * 24 * 60
+  requested_offset = abs(int(params_dict.get("maxOffsetMinutes") or 120))
+  max_offset_minutes = min(requested_offset, offset_limit)
+
+  result = await asyncio.to_thread(
+    sensitivity_curve, transactions, start, end,
+    max_offset_minutes=max_offset_minutes,
+    step_minutes=int(params_dict.get("stepMinutes") or 5),
+    target_count=int(target_count) if target_count is not None else None,
+    target_amount=Decimal(str(target_amount)) if target_amount is not None else None
+  )
+
+  result["max_offset_minutes"] = max_offset_minutes
+  if requested_offset > offset_limit:
+    result["note"] = f"maxOffsetMinutes {requested_offset} was reduced to {offset_limit}, the transactions loaded around the window"
+
+  return json.dumps(result, separators=(",", ":"))
@@ -0,0 +1,63 @@
+import asyncio
+import json
+from decimal import Decimal
+
+from app.dependencies import get_report_service
+from app.services.reconciliation.discrepancy_explainer import explain_discrepancy
+from app.services.reconciliation.transaction_window import load_padded_window_transactions
+from app.services.report_processing.fac_report_store import get_fac_window
+from app.services.report_processing.report_service import ReportService
+
+def explain_discrepancy_tool_definition() -> dict:
+  return {
+    "type":"function",
+    "function":{
+      "name":"explain_fac_discrepancy",
+      "description":"Searches the FAC transactions closest to the 6AM settlement cutoffs for sets of transactions equal to the report count difference "
+        "whose removal from, or inclusion in, the FAC report window matches the VisaNet transaction count and total. Returns ranked explanations, closest to the cutoff first.",
+      "parameters":{
+        "type":"object",
+        "properties": {
+          "facReportStartDate": {
+            "type": "string",
+            "description": "The start date of the FAC report being reconciled in format MM/dd/yyyy",
+            "nullable": False
+          },
+          "facReportEndDate": {
+            "type": "string",
+            "description": "The end date of the FAC report being reconciled in format MM/dd/yyyy",
+            "nullable": False
+          },
+          "visaNetTransactionCount": {
+            "type": "number",
+            "description": "The purchase original sale count from the VisaNet report",
+            "nullable": False
+          },
+          "visaNetSettlementAmount": {
+            "type": "number",
+            "description": "The purchase original sale clearing amount from the VisaNet report",
+            "nullable": False
+          }
+        },
+        "required": [
+          "facReportStartDate", "facReportEndDate",
+          "visaNetTransactionCount", "visaNetSettlementAmount"
+        ]
+      }
+    }
+  }
+
+async def explain_discrepancy_tool_handler(params_json: str) -> str:
+  params_dict = json.loads(params_json)
+  start, end = get_fac_window(params_dict["facReportStartDate"], params_dict["facReportEndDate"])
+
+  report_service: ReportService = get_report_service()
+  transactions = await load_padded_window_transactions(report_service, start, end)
+
+  result = await asyncio.to_thread(
+    explain_discrepancy, transactions, start, end,
+    target_count=int(params_dict["visaNetTransactionCount"]),
+    target_amount=Decimal(str(params_dict["visaNetSettlementAmount"]))
+  )
+
+  return result.model_dump_json()
@@ -1,13 +1,16 @@
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
+import hashlib
 from os import path
 import re
+import time
 from pathlib import Path
 
 from fastapi import Depends
 from app.services.report_processing.report_service import ReportService
 from app.dependencies import get_report_service
 import pdfplumber 
+import pypdfium2 as pdfium
 import logging
 
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
@@ -23,6 +26,15 @@ DATE_RE = re.compile(
   re.I
 )
 
+# Bump when the parsing logic changes without a regex change so cached extractions are invalidated
+PARSER_REVISION = 1
+PARSER_VERSION = hashlib.sha256(
+  "\n".join(
+    [str(PARSER_REVISION), ROW_LABEL] +
+    [f"{x.pattern}/{x.flags}" for x in (REPORT_ID_RE, SETTLEMENT_RE, CLEARING_RE, TITLE_RE, ROW_RE, DATE_RE)]
+  ).encode("utf-8")
+).hexdigest()[:16]
+
 def __normalise_date(raw: str) -> date | None:
   """
   Convert many common VisaNet date formats to a datetime.date.
@@ -38,18 +50,67 @@ def __normalise_date(raw: str) -> date | None:
   return None
 
 
-def __find_page_text(pdf_path: Path) -> str | None:
-  with pdfplumber.open(pdf_path) as pdf:
-    for page in pdf.pages:
-      text = page.extract_text() or ""
-      if (REPORT_ID_RE.search(text)
-            and SETTLEMENT_RE.search(text)
-            and CLEARING_RE.search(text)
-            and TITLE_RE.search(text)):
-          return text
+def __locate_candidate_pages(pdf_path: Path) -> list[int] | None:
+  """
+  Cheap raw text scan with pdfium for the pages that mention the VSS-120 report in TTD.
+  Returns None when pdfium reads no text at all, e.g. a scanned document, so the caller falls back to pdfplumber.
+  """
+  candidates: list[int] = []
+  has_text = False
+  pdf = pdfium.PdfDocument(pdf_path)
+  try:
+    for page_number in range(len(pdf)):
+      page = pdf[page_number]
+      text_page = page.get_textpage()
+      try:
+        text = text_page.get_text_bounded() or ""
+      finally:
+        text_page.close()
+        page.close()
+
+      has_text = has_text or bool(text.strip())
+      if REPORT_ID_RE.search(text) and SETTLEMENT_RE.search(text):
+        candidates.append(page_number)
+  finally:
+    pdf.close()
+
+  return candidates if has_text else None
+
+
+def __find_page_text(pdf_path: Path, timings: dict[str, float]) -> str | None:
+  started = time.perf_counter()
+  try:
+    candidates = __locate_candidate_pages(pdf_path)
+  except Exception:
+    logging.warning(f"Unable to scan {pdf_path.name} with pdfium", exc_info=True)
+    candidates = None
+  timings["locate"] = time.perf_counter() - started
+
+  # pdfium read the text and no page mentions the report, not a VisaNet file
+  if candidates == []:
     logging.info("Unable to locate report page")
     return None
 
+  started = time.perf_counter()
+  try:
+    with pdfplumber.open(pdf_path) as pdf:
+      # Only the candidates get full layout analysis, every page when pdfium could not read the text
+      pages = candidates if candidates is not None else range(len(pdf.pages))
+      for page_number in pages:
+        page = pdf.pages[page_number]
+        text = page.extract_text() or ""
+        page.close()
+
+        if (REPORT_ID_RE.search(text)
+              and SETTLEMENT_RE.search(text)
+              and CLEARING_RE.search(text)
+              and TITLE_RE.search(text)):
+            return text
+      logging.info("Unable to locate report page")
+      return None
+  finally:
+    timings["layout"] = time.perf_counter() - started
+
 
 def __extract_original_sale(page_text: str) -> tuple[int, Decimal, date] | None:
   """
@@ -77,8 +138,7 @@ def __extract_original_sale(page_text: str) -> tuple[int, Decimal, date] | None:
   return count, amount, report_date
 
 
-def extract_visa_net_data(pdf_file: str) -> tuple[int, Decimal, date] | None:
-  logging.info(f"Visa net file name {pdf_file}")
+def get_visa_net_file(pdf_file: str) -> Path | None:
   if not pdf_file.endswith('.pdf'):
     pdf_file = f"{pdf_file}.pdf"
 
@@ -89,17 +149,37 @@ def extract_visa_net_data(pdf_file: str) -> tuple[int, Decimal, date] | None:
     logging.info(f"Visa net file {pdf_file} does not exist as {file_path}")
     return None
 
-  page_text = __find_page_text(Path(file_path))
-  if page_text is None:
-      return None
+  return Path(file_path)
 
-  result = __extract_original_sale(page_text)
-  if result is None:
+
+def extract_visa_net_data(pdf_file: str) -> tuple[int, Decimal, date] | None:
+  logging.info(f"Visa net file name {pdf_file}")
+
+  file_path = get_visa_net_file(pdf_file)
+  if not file_path:
     return None
 
-  count, amount, report_date = result
+  return extract_visa_net_data_from_path(file_path)
 
-  return count, amount, report_date
+
+def extract_visa_net_data_from_path(pdf_path: Path) -> tuple[int, Decimal, date] | None:
+  timings: dict[str, float] = {}
+  try:
+    page_text = __find_page_text(pdf_path, timings)
+    if page_text is None:
+        return None
+
+    started = time.perf_counter()
+    result = __extract_original_sale(page_text)
+    timings["parse"] = time.perf_counter() - started
+    if result is None:
+      return None
+
+    count, amount, report_date = result
+
+    return count, amount, report_date
+  finally:
+    logging.info(f"Visa net file {pdf_path.name} parsed in " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in timings.items()))
 
 
 def extract_visa_net_data_tool_definition() -> dict:
@@ -1,9 +1,12 @@
+import asyncio
 import json
+from pathlib import Path
 
 from fastapi import Depends
 
 from app.dependencies import get_report_service
 from app.dtos.report.create_report_dto import CreateReportDto
+from app.services.report_processing.fac_report_analytics import summarize_fac_report
 from app.services.report_processing.report_service import ReportService
 
 def generate_fac_report_tool_definition() -> dict:
@@ -11,7 +14,7 @@ def generate_fac_report_tool_definition() -> dict:
     "type":"function",
     "function":{
       "name":"generate_fac_report",
-      "description":"Generates a FAC transaction report for the specified period and returns an open ai file_id, the file name and file type. This period must be within 1 year of the current date.",
+      "description":"Generates a FAC transaction report for the specified period and returns the report file name, transaction count, transaction total, first and last transaction times and hourly counts and totals. This period must be within 1 year of the current date.",
       "parameters":{
         "type":"object",
         "properties": {
@@ -45,4 +48,6 @@ async def generate_fac_report_tool_handler(params_json: str) -> str:
   report_service: ReportService = get_report_service()
   file_path = await report_service.generate_csv_report(create_report_dto=create_report_dto.to_dict())
 
-  return file_path
\ No newline at end of file
+  summary = await asyncio.to_thread(summarize_fac_report, file_path)
+
+  return json.dumps({"report_file_name": Path(file_path).stem, **summary})
\ No newline at end of file
@@ -0,0 +1,94 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils.metrics import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ToolContext:
+  '''
+  State of the run a tool call belongs to, handed to every handler.
+  '''
+  thread_id: str
+  db: AsyncSession
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+  '''
+  A function tool of the assistant.
+
+  handler is called with the raw json arguments and the ToolContext and returns the tool output.
+  Sync handlers are run in a worker thread. Tools that are not parallel_safe, such as the ones writing through the
+  shared run session, are run one after another in the order the assistant asked for them.
+  '''
+  name: str
+  definition: Callable[[], dict]
+  handler: Callable[[str, ToolContext], Any]
+  is_async: bool
+  parallel_safe: bool
+
+
+class ToolRegistry:
+  def __init__(self):
+    self._tools: Dict[str, ToolSpec] = {}
+
+  def register(self, spec: ToolSpec):
+    if spec.name in self._tools:
+      raise ValueError(f"Tool {spec.name} is already registered")
+    self._tools[spec.name] = spec
+
+  def get(self, name: str) -> ToolSpec:
+    spec = self._tools.get(name)
+    if spec is None:
+      raise ValueError(f"Unrecognized function call {name}")
+    return spec
+
+  def definitions(self) -> Dict[str, dict]:
+    return {name: spec.definition() for name, spec in self._tools.items()}
+
+  async def run(self, name: str, arguments: str, context: ToolContext) -> str:
+    spec = self.get(name)
+    logger.info(f"Function call {name} with args {arguments}")
+
+    try:
+      with metrics.timer(f"assistant_tool.{name}"):
+        if spec.is_async:
+          return await spec.handler(arguments, context)
+        return await asyncio.to_thread(spec.handler, arguments, context)
+    except Exception:
+      metrics.increment(f"assistant_tool.{name}.failures")
+      raise
+
+  async def run_tool_calls(self, tool_calls: List[Any], context: ToolContext) -> List[dict]:
+    '''
+    Runs one requires_action batch and returns the tool outputs in the order of tool_calls.
+    Parallel safe calls run concurrently next to the sequential ones. When a call fails the other calls of the batch are
+    cancelled and awaited before the error is raised, so none of them keeps using the run session after the batch.
+    '''
+    specs = [self.get(x.function.name) for x in tool_calls]
+    outputs: Dict[str, str] = {}
+
+    async def run_call(tool_call):
+      outputs[tool_call.id] = await self.run(tool_call.function.name, tool_call.function.arguments, context)
+
+    async def run_sequential(calls):
+      for tool_call in calls:
+        await run_call(tool_call)
+
+    parallel = [x for x, spec in zip(tool_calls, specs) if spec.parallel_safe]
+    sequential = [x for x, spec in zip(tool_calls, specs) if not spec.parallel_safe]
+
+    with metrics.timer("assistant_tool.batch"):
+      async with asyncio.TaskGroup() as group:
+        for tool_call in parallel:
+          group.create_task(run_call(tool_call))
+        group.create_task(run_sequential(sequential))
+
+    return [{"tool_call_id": x.id, "output": outputs[x.id]} for x in tool_calls]
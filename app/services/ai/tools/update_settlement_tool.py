@@ -1,9 +1,10 @@
 import json
 
-from app.dependencies import get_db_context
+from app.dependencies import use_db_context
 from app.dtos.settlement.update_settlement_dto import UpdateSettlementDto
 from app.exceptions.settlement_exceptions import SettlementAlreadyCompletedError
 from app.services.settlement_processing.settlement_service import SettlementService
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,7 +59,7 @@ def update_settlement_record_tool_definition() -> dict :
     }
   }
 
-async def update_settlement_record_tool_handler(params_json: str) -> str:
+async def update_settlement_record_tool_handler(params_json: str, db: AsyncSession | None = None) -> str:
   params_dict: dict = json.loads(params_json)
   visa_net_report_date = params_dict["visaNetReportDate"]
   fac_report_file_name =  params_dict.get("facReportFileName")
@@ -77,8 +78,8 @@ async def update_settlement_record_tool_handler(params_json: str) -> str:
   )
 
   try:
-    async with get_db_context() as db:
-      settlement_service: SettlementService = SettlementService(db)
+    async with use_db_context(db) as session:
+      settlement_service: SettlementService = SettlementService(session)
       await settlement_service.update_settlement(update_settlement_dto)
     return "Settlement updated successfully"
   except SettlementAlreadyCompletedError as se:
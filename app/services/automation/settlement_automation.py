@@ -1,27 +1,79 @@
+import asyncio
+import base64
+import uuid
+from os import path, remove, replace
+from pathlib import Path
 from app.dtos.ai.responses.visa_net_file_check_result import VisaNetFileCheckResult
 from app.dtos.events.settlement_event import SettlementEvent
-from app.dependencies import get_mail_client
+from app.dependencies import get_db_context, get_mail_client, get_report_service
 from app.dtos.mail.mail_message_dto import MailAttachmentDto
 from app.services.ai import openai_service
-import logging 
+from app.services.report_processing.visa_net_extraction_service import VisaNetExtractionService
+from app.utils.metrics import metrics
+import logging
 
 _logger = logging.getLogger(__name__)
 
 
+def read_base64(file_path: Path) -> str:
+  with open(file_path, "rb") as f:
+    return base64.b64encode(f.read()).decode("utf-8")
+
+
+async def check_visa_net_attachment(file_path: Path, attachment_dto: MailAttachmentDto) -> VisaNetFileCheckResult:
+  '''
+  Local pdf extraction first, the assistant only reads the file when local parsing fails.
+  '''
+  try:
+    async with get_db_context() as db:
+      extraction = await VisaNetExtractionService(db).extract_path(file_path)
+  except Exception:
+    _logger.warning(f"Local extraction failed for {attachment_dto.name}", exc_info=True)
+    extraction = None
+
+  if extraction:
+    metrics.increment("settlement_automation.local_file_check")
+    count, amount, report_date = extraction
+    return VisaNetFileCheckResult(
+      is_visa_net_file=True, file_report_date=report_date.strftime("%Y-%m-%d"),
+      transaction_clearing_amount_ttd=amount, transaction_count=count
+    )
+
+  metrics.increment("settlement_automation.llm_file_check")
+  base64_string = await asyncio.to_thread(read_base64, file_path)
+  file_data = f"data:{attachment_dto.content_type};base64,{base64_string}"
+
+  with metrics.timer("settlement_automation.llm_file_check"):
+    return await openai_service.isVisaNetSettlementFile(file_data=file_data, filename=attachment_dto.name)
+
+
 async def process_settlement_automation(event: SettlementEvent):
   mail_client = get_mail_client()
-  attachment_dto: MailAttachmentDto | None = await mail_client.get_attachment_by_id(event.attachment_id)
+  attachment_dto: MailAttachmentDto | None = await mail_client.get_attachment_by_id(
+    event.email_id, event.attachment_id, include_content=False
+  )
 
-  if not attachment_dto:
+  if not attachment_dto or not attachment_dto.name:
     return
 
-  base64_string = attachment_dto.content_bytes.decode("utf-8")
-  file_data = f"data:{attachment_dto.content_type};base64,{base64_string}"
+  # Checked under a unique name and only moved to where the extraction tools look for VisaNet files once it is one,
+  # so rejected attachments and name clashes never touch the files the assistant reads
+  file_name = path.basename(attachment_dto.name)
+  file_path = get_report_service().get_visa_net_file_path(file_name)
+  candidate_path = path.join(path.dirname(file_path), f".{file_name}.{uuid.uuid4().hex}.part")
 
-  check_result:VisaNetFileCheckResult = openai_service.isVisaNetSettlementFile(file_data=file_data, filename=attachment_dto.name)
+  try:
+    await mail_client.download_attachment(event.email_id, event.attachment_id, candidate_path)
+
+    check_result:VisaNetFileCheckResult = await check_visa_net_attachment(Path(candidate_path), attachment_dto)
+
+    if not check_result.is_visa_net_file:
+      _logger.info("File was not seen as ucl plater")
+      return
+
+    replace(candidate_path, file_path)
+  finally:
+    if path.exists(candidate_path):
+      remove(candidate_path)
 
-  if not check_result.is_visa_net_file:
-    _logger.info("File was not seen as ucl plater")
-    return
-  
   # TODO: Continue from here
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from functools import lru_cache
+from os import path
+import re
+import logging
+
+from app.dtos.mail.mail_message_dto import MailAttachmentDto
+from app.services.ai import openai_service
+from app.settings import settings
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Names like 'TT  Acquirer Visa Files 07.05.2025.pdf', 'TT_Acquirer_Visa_Files_01.05.2025.pdf' or 'TT Aquirer Visa Files 01.01.2025.pdf'
+VISA_NET_FILE_NAME_PATTERN = re.compile(r"ac?qu?irer[\s_\-]*visa[\s_\-]*files?", re.IGNORECASE)
+# Words that make a pdf worth a second look when the pattern does not match
+VISA_NET_KEYWORD_PATTERN = re.compile(r"visa|vss|settle|ac?qu?ir", re.IGNORECASE)
+
+PDF_EXTENSION = ".pdf"
+PDF_CONTENT_TYPES = {"application/pdf", "application/x-pdf", "application/octet-stream"}
+MIN_VISA_NET_FILE_SIZE = 4 * 1024
+
+MAX_REMEMBERED_LLM_RESULTS = 1024
+
+_llm_results: OrderedDict[str, bool] = OrderedDict()
+
+
+@lru_cache(maxsize=4096)
+def _classify_name(name: str) -> bool | None:
+  normalized = " ".join(name.strip().split())
+
+  if path.splitext(normalized)[1].lower() != PDF_EXTENSION:
+    return False
+  if VISA_NET_FILE_NAME_PATTERN.search(normalized):
+    return True
+  if not VISA_NET_KEYWORD_PATTERN.search(normalized):
+    return False
+
+  return None
+
+
+def classify_visa_net_attachment(name: str, content_type: str | None = None, size: int | None = None) -> bool | None:
+  '''
+  Decides locally whether an attachment could be a VisaNet settlement report.
+  Returns True or False for the clear cases and None when the name is ambiguous and needs the assistant.
+  '''
+  if content_type and content_type.split(";")[0].strip().lower() not in PDF_CONTENT_TYPES:
+    return False
+  if size is not None and not MIN_VISA_NET_FILE_SIZE <= size <= settings.VISA_NET_MAX_ATTACHMENT_BYTES:
+    logger.warning(
+      f"Skipping attachment {name} of {size} bytes, outside the VisaNet size range "
+      f"{MIN_VISA_NET_FILE_SIZE} to {settings.VISA_NET_MAX_ATTACHMENT_BYTES} bytes"
+    )
+    metrics.increment("attachment_classifier.size_rejected")
+    return False
+
+  return _classify_name(name)
+
+
+async def is_visa_net_attachment(attachment: MailAttachmentDto) -> bool:
+  '''
+  Local rules first, the assistant only for ambiguous names. Both outcomes are memoized by name.
+  '''
+  if not attachment.name:
+    return False
+
+  decision = classify_visa_net_attachment(attachment.name, attachment.content_type, attachment.size)
+
+  if decision is not None:
+    metrics.increment("attachment_classifier.fast_path_true" if decision else "attachment_classifier.fast_path_false")
+    return decision
+
+  if attachment.name in _llm_results:
+    metrics.increment("attachment_classifier.llm_memoized")
+    _llm_results.move_to_end(attachment.name)
+    return _llm_results[attachment.name]
+
+  metrics.increment("attachment_classifier.llm_calls")
+  with metrics.timer("attachment_classifier.llm"):
+    decision = await openai_service.isVisaNetSettlementFileName(attachment.name)
+
+  logger.info(f"Assistant classified ambiguous attachment {attachment.name} as {decision}")
+
+  _llm_results[attachment.name] = decision
+  if len(_llm_results) > MAX_REMEMBERED_LLM_RESULTS:
+    _llm_results.popitem(last=False)
+
+  return decision
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+import json
+from typing import Awaitable, Callable, List
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dtos.mail.mail_message_dto import MailMessageDto
+from app.services.mail.mail_service import MailService
+from app.services.sync.sync_state_service import SyncStateService
+from app.settings import settings
+import logging
+
+_logger = logging.getLogger(__name__)
+
+BACKLOG_CHECKPOINT_KEY = "mail_backlog_checkpoint"
+
+
+class MailBacklogService:
+  '''
+  Catches up on inbox messages received since the last checkpoint, for example after a restart or a missed subscription.
+  Message ids are paged oldest first and their metadata is fetched with Graph JSON batches.
+
+  The checkpoint is the received time of the newest handled message together with the ids handled at exactly that time,
+  since the listing filter is inclusive and only has second precision. It only moves past messages that were handled,
+  a message that could not be fetched or handled stops the drain so the next drain resumes from it.
+  '''
+  def __init__(self, db: AsyncSession, mail_service: MailService):
+    self.db = db
+    self.mail_service = mail_service
+    self.sync_state = SyncStateService(db)
+
+  async def drain(self, handle_message: Callable[[MailMessageDto], Awaitable[None]]) -> int:
+    received_since, handled_ids = self._parse_checkpoint(await self.sync_state.get(BACKLOG_CHECKPOINT_KEY))
+    if received_since is None:
+      received_since = datetime.now(timezone.utc) - timedelta(hours=settings.MAIL_BACKLOG_LOOKBACK_HOURS)
+    _logger.info(f"Draining mail backlog since {received_since}")
+
+    drained = 0
+    checkpoint = (received_since, handled_ids)
+    async for page in self.mail_service.list_inbox_messages(received_since, settings.MAIL_BACKLOG_PAGE_SIZE):
+      pending = [
+        x for x in page
+        if x.id and x.received_date_time and not self._is_handled(x.received_date_time, x.id, *checkpoint)
+      ]
+      if not pending:
+        continue
+
+      messages = await self.mail_service.get_mails_by_ids([x.id for x in pending])
+      failed = False
+      try:
+        for item, message in zip(pending, messages):
+          if message is None:
+            _logger.warning(f"Could not fetch backlog message {item.id}, stopping the drain at {item.received_date_time}")
+            failed = True
+            break
+
+          await handle_message(message)
+          drained += 1
+          checkpoint = self._advance(checkpoint, item.received_date_time, item.id)
+      finally:
+        await self.sync_state.set(BACKLOG_CHECKPOINT_KEY, self._format_checkpoint(*checkpoint))
+
+      if failed:
+        break
+
+    _logger.info(f"Drained {drained} messages from the mail backlog")
+    return drained
+
+  @staticmethod
+  def _is_handled(received: datetime, message_id: str, checkpoint_time: datetime, handled_ids: List[str]) -> bool:
+    return received < checkpoint_time or (received == checkpoint_time and message_id in handled_ids)
+
+  @staticmethod
+  def _advance(checkpoint: tuple[datetime, List[str]], received: datetime, message_id: str) -> tuple[datetime, List[str]]:
+    checkpoint_time, handled_ids = checkpoint
+    if received == checkpoint_time:
+      return checkpoint_time, [*handled_ids, message_id]
+    return received, [message_id]
+
+  @staticmethod
+  def _parse_checkpoint(value: str | None) -> tuple[datetime | None, List[str]]:
+    if not value:
+      return None, []
+
+    # Checkpoints written before the handled ids were stored are a bare received time
+    if not value.startswith("{"):
+      return datetime.fromisoformat(value), []
+
+    checkpoint = json.loads(value)
+    return datetime.fromisoformat(checkpoint["received_date_time"]), checkpoint.get("ids", [])
+
+  @staticmethod
+  def _format_checkpoint(received: datetime, handled_ids: List[str]) -> str:
+    return json.dumps({"received_date_time": received.isoformat(), "ids": handled_ids})
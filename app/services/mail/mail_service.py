@@ -1,7 +1,21 @@
+import asyncio
 import base64
-from typing import List
-from azure.identity import ClientSecretCredential
-from msgraph import GraphServiceClient
+import time
+from os import path, remove, replace
+from typing import AsyncIterator, List
+import uuid
+import httpx
+from azure.core.credentials import AccessToken
+from azure.identity.aio import ClientSecretCredential
+from kiota_abstractions.base_request_configuration import RequestConfiguration
+from kiota_authentication_azure.azure_identity_authentication_provider import AzureIdentityAuthenticationProvider
+from kiota_serialization_json.json_parse_node import JsonParseNode
+from msgraph import GraphRequestAdapter, GraphServiceClient
+from msgraph_core import GraphClientFactory
+from msgraph.generated.users.item.messages.item.message_item_request_builder import MessageItemRequestBuilder
+from msgraph.generated.users.item.messages.item.attachments.item.attachment_item_request_builder import AttachmentItemRequestBuilder
+from msgraph.generated.users.item.mail_folders.item.messages.messages_request_builder import MessagesRequestBuilder
+from msgraph.generated.users.item.mail_folders.item.messages.delta.delta_request_builder import DeltaRequestBuilder
 from app.dtos.mail.mail_message_dto import MailAttachmentDto, MailEmailAddressDto, MailMessageDto, MailRecipientDto
 from app.utils.template_renderer import render_template
 from msgraph.generated.users.item.send_mail.send_mail_post_request_body import SendMailPostRequestBody
@@ -14,27 +28,135 @@ from msgraph.generated.models.attachment import Attachment
 from msgraph.generated.models.file_attachment import FileAttachment
 from msgraph.generated.models.subscription import Subscription
 from app.settings import settings
+from app.utils.metrics import metrics
 from datetime import datetime, timezone, timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
 
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+MESSAGE_SELECT = [
+  "id", "subject", "bodyPreview", "hasAttachments", "from", "sender", "toRecipients", "ccRecipients", "bccRecipients"
+]
+ATTACHMENT_SELECT = ["id", "name", "size", "contentType", "isInline"]
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+HTTP_TIMEOUT_SECONDS = 60
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+# Graph accepts at most 20 requests in a JSON batch
+MAX_BATCH_SIZE = 20
+MAX_BATCH_ATTEMPTS = 3
+BATCH_RETRY_STATUSES = {429, 503, 504}
+
+
+def _to_recipient_dto(recipient: Recipient | None) -> MailRecipientDto | None:
+  if not recipient or not recipient.email_address or not recipient.email_address.address:
+    return None
+
+  return MailRecipientDto(
+    email_address=MailEmailAddressDto(name=recipient.email_address.name, address=recipient.email_address.address)
+  )
+
+
+def _to_mail_message_dto(message_item: Message) -> MailMessageDto:
+  mail_message = MailMessageDto(
+    id=message_item.id,
+    body_preview=message_item.body_preview,
+    subject=message_item.subject,
+    has_attachment=message_item.has_attachments,
+    sender=_to_recipient_dto(message_item.sender),
+    from_=_to_recipient_dto(message_item.from_)
+  )
+
+  if message_item.to_recipients:
+    mail_message.to_recipients = [x for x in map(_to_recipient_dto, message_item.to_recipients) if x]
+
+  if message_item.bcc_recipients:
+    mail_message.bcc_recipients = [x for x in map(_to_recipient_dto, message_item.bcc_recipients) if x]
+
+  if message_item.cc_recipients:
+    mail_message.cc_recipients = [x for x in map(_to_recipient_dto, message_item.cc_recipients) if x]
+
+  if message_item.attachments:
+    mail_message.attachments = [_to_attachment_dto(x) for x in message_item.attachments if x.id]
+
+  return mail_message
+
+
+def _to_attachment_dto(attachment: Attachment) -> MailAttachmentDto:
+  dto = MailAttachmentDto(
+    odata_type=attachment.odata_type,
+    id=attachment.id, content_type=attachment.content_type,
+    name=attachment.name, size=attachment.size, is_inline=attachment.is_inline
+  )
+
+  if isinstance(attachment, FileAttachment):
+    dto.content_bytes = attachment.content_bytes
+
+  return dto
+
+
+class _TimedCredential:
+  '''
+  Async credential wrapper that records token latency and counts the refreshes behind the credential cache.
+  '''
+  def __init__(self, credential: ClientSecretCredential):
+    self._credential = credential
+    self._expires_on: int | None = None
+
+  async def get_token(self, *scopes: str, **kwargs) -> AccessToken:
+    with metrics.timer("mail.token"):
+      token = await self._credential.get_token(*scopes, **kwargs)
+
+    if token.expires_on != self._expires_on:
+      self._expires_on = token.expires_on
+      metrics.increment("mail.token_refresh")
+
+    return token
+
+  async def close(self):
+    await self._credential.close()
+
+
+async def _on_request(request: httpx.Request):
+  request.extensions["started_at"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response):
+  started_at = response.request.extensions.get("started_at")
+  if started_at is not None:
+    metrics.observe("mail.graph_request", time.perf_counter() - started_at)
+  metrics.increment(f"mail.graph_response.{response.status_code // 100}xx")
+
+
 class MailService:
+  '''
+  Graph mail client. One instance is shared by the process, see dependencies.get_mail_client,
+  so the token cache and the keep alive HTTP/2 connections are reused across requests and events.
+  '''
   def __init__(self):
-    self._credential: ClientSecretCredential | None = None
-    self._client: GraphServiceClient | None = None
-    self._service_user: str | None = None
-
-    self._credential = ClientSecretCredential(
+    self._credential = _TimedCredential(ClientSecretCredential(
       tenant_id= settings.MAIL_CLIENT_TENANT_ID,
       client_id= settings.MAIL_CLIENT_ID,
       client_secret= settings.MAIL_CLIENT_SECRET
-    )
-    scopes = ['https://graph.microsoft.com/.default']
+    ))
+    scopes = [GRAPH_SCOPE]
 
     self._service_user =  settings.MAIL_SERVICE_USER
 
-    self._client = GraphServiceClient(credentials=self._credential, scopes=scopes)
+    self._http_client = GraphClientFactory.create_with_default_middleware(client=httpx.AsyncClient(
+      http2=True, timeout=HTTP_TIMEOUT_SECONDS,
+      limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS),
+      event_hooks={"request": [_on_request], "response": [_on_response]}
+    ))
+    auth_provider = AzureIdentityAuthenticationProvider(self._credential, scopes=scopes)
+
+    self._client = GraphServiceClient(request_adapter=GraphRequestAdapter(auth_provider, client=self._http_client))
+
+  async def close(self):
+    await self._http_client.aclose()
+    await self._credential.close()
 
 
   async def send_mail(self, subject:str | None = None, html_body: str | None = None, recipients: List[str] = []):
@@ -95,86 +217,172 @@ class MailService:
 
 
   async def get_mail_by_id(self, email_id: str) -> MailMessageDto | None:
+    '''
+    Message headers with attachment metadata only, the attachment content is fetched later for the candidates.
+    '''
+    query_parameters = MessageItemRequestBuilder.MessageItemRequestBuilderGetQueryParameters(
+      select=MESSAGE_SELECT,
+      expand=[f"attachments($select={','.join(ATTACHMENT_SELECT)})"]
+    )
     message_item = await self._client.users.by_user_id(self._service_user).messages.by_message_id(email_id).get(
-      request_configuration={
-        "config":{
-          "query_parameters":{
-            "expand":["attachments"]
-          }
-        }
-      }
+      request_configuration=RequestConfiguration(query_parameters=query_parameters)
     )
 
     if not message_item:
       return None
-    
-    mail_message = MailMessageDto(
-      id=message_item.id,
-      body_preview=message_item.body_preview,
-      subject=message_item.subject,
-      has_attachment=message_item.has_attachments
+
+    return _to_mail_message_dto(message_item)
+
+  async def get_mails_by_ids(self, email_ids: List[str]) -> List[MailMessageDto | None]:
+    '''
+    Same metadata as get_mail_by_id for many messages, fetched with JSON batches.
+    Returns the messages in the order of email_ids, None for messages that could not be fetched.
+    '''
+    query = f"$select={','.join(MESSAGE_SELECT)}&$expand=attachments($select={','.join(ATTACHMENT_SELECT)})"
+    bodies = await self.batch_get([f"/users/{self._service_user}/messages/{x}?{query}" for x in email_ids])
+
+    return [
+      _to_mail_message_dto(JsonParseNode(body).get_object_value(Message)) if body else None
+      for body in bodies
+    ]
+
+  async def list_inbox_messages(self, received_since: datetime, page_size: int) -> AsyncIterator[List[Message]]:
+    '''
+    Pages of inbox message ids and received times, oldest first, received at or after received_since.
+    '''
+    query_parameters = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
+      select=["id", "receivedDateTime"],
+      filter=f"receivedDateTime ge {received_since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+      orderby=["receivedDateTime asc"],
+      top=page_size
     )
+    builder = self._client.users.by_user_id(self._service_user).mail_folders.by_mail_folder_id("inbox").messages
+    page = await builder.get(request_configuration=RequestConfiguration(query_parameters=query_parameters))
 
-    if message_item.from_ and message_item.from_.email_address and message_item.from_.email_address.address:
-      mail_message.from_ = MailRecipientDto(
-        email_address=MailEmailAddressDto(
-          name=message_item.from_.email_address.name,
-          address=mail_message.from_.email_address.address
-        )
+    while page:
+      yield page.value or []
+
+      if not page.odata_next_link:
+        break
+      page = await builder.with_url(page.odata_next_link).get()
+
+  async def get_inbox_delta(self, delta_link: str | None, received_since: datetime) -> tuple[List[Message], str | None]:
+    '''
+    Inbox messages created since the delta link, following every page of the round.
+    Without a delta link a new sync is started from messages received since received_since.
+    Returns the messages and the delta link for the next round.
+    '''
+    builder = self._client.users.by_user_id(self._service_user).mail_folders.by_mail_folder_id("inbox").messages.delta
+
+    if delta_link:
+      page = await builder.with_url(delta_link).get()
+    else:
+      query_parameters = DeltaRequestBuilder.DeltaRequestBuilderGetQueryParameters(
+        select=["id", "receivedDateTime"], change_type="created",
+        filter=f"receivedDateTime ge {received_since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}"
       )
+      page = await builder.get(request_configuration=RequestConfiguration(query_parameters=query_parameters))
 
-    if message_item.to_recipients and len(message_item.to_recipients) > 0:
-      mail_message.to_recipients = []
-      for recipient in message_item.to_recipients:
-        if recipient.email_address and recipient.email_address.address:
-          dto = MailRecipientDto(email_address=MailEmailAddressDto(address=recipient.email_address.address))
-          mail_message.to_recipients.append(dto)
-
-    if message_item.bcc_recipients and len(message_item.bcc_recipients) > 0:
-      mail_message.bcc_recipients = []
-      for recipient in message_item.bcc_recipients:
-        if recipient.email_address and recipient.email_address.address:
-          dto = MailRecipientDto(email_address=MailEmailAddressDto(address=recipient.email_address.address))
-          mail_message.bcc_recipients.append(dto)
-
-    if message_item.cc_recipients and len(message_item.cc_recipients) > 0:
-      mail_message.cc_recipients = []
-      for recipient in message_item.cc_recipients:
-        if recipient.email_address and recipient.email_address.address:
-          dto = MailRecipientDto(email_address=MailEmailAddressDto(address=recipient.email_address.address))
-          mail_message.cc_recipients.append(dto)
-
-    if message_item.attachments and len(message_item.attachments) > 0:
-      mail_message.attachments = []
-
-      for attachment in message_item.attachments:
-        if attachment.id:
-          dto = MailAttachmentDto(
-            odata_type=attachment.odata_type,
-            id=attachment.id, content_type=attachment.content_type,
-            name=attachment.name, size=attachment.size
-          )
+    messages: List[Message] = []
+    while page:
+      # Removed messages only carry their id and an @removed annotation
+      messages.extend(x for x in page.value or [] if x.id and "@removed" not in (x.additional_data or {}))
+
+      if not page.odata_next_link:
+        return messages, page.odata_delta_link
+      page = await builder.with_url(page.odata_next_link).get()
+
+    return messages, None
+
+  async def batch_get(self, urls: List[str]) -> List[dict | None]:
+    '''
+    Runs GET requests relative to the Graph version root through $batch, 20 at a time.
+    Returns the response bodies in the order of urls, None for requests that failed.
+    Throttled sub requests are retried after the longest Retry-After of the batch.
+    '''
+    results: List[dict | None] = [None] * len(urls)
+
+    for offset in range(0, len(urls), MAX_BATCH_SIZE):
+      await self._send_batch(urls, list(range(offset, min(offset + MAX_BATCH_SIZE, len(urls)))), results)
+
+    return results
+
+  async def _send_batch(self, urls: List[str], indexes: List[int], results: List[dict | None]):
+    pending = indexes
 
-          if isinstance(attachment, FileAttachment):
-            dto.content_bytes = attachment.content_bytes
-          mail_message.attachments.append(dto)
+    for _ in range(MAX_BATCH_ATTEMPTS):
+      access_token = await self._get_access_token()
+      body = {"requests": [{"id": str(i), "method": "GET", "url": urls[i]} for i in pending]}
+
+      with metrics.timer("mail.graph_batch"):
+        response = await self._http_client.post(
+          f"{GRAPH_BASE_URL}/$batch", json=body, headers={"Authorization": f"Bearer {access_token}"}
+        )
+      response.raise_for_status()
+
+      retry: List[int] = []
+      retry_after = 1
+      for item in response.json().get("responses", []):
+        index = int(item["id"])
+        status = item.get("status", 0)
+
+        if status in BATCH_RETRY_STATUSES:
+          retry.append(index)
+          retry_after = max(retry_after, int((item.get("headers") or {}).get("Retry-After", 1)))
+        elif 200 <= status < 300:
+          results[index] = item.get("body")
+        else:
+          _logger.warning(f"Batched request {urls[index]} failed with {status}")
+
+      metrics.increment("mail.graph_batch_requests", len(pending))
+      if not retry:
+        return
+
+      pending = retry
+      await asyncio.sleep(retry_after)
+
+    _logger.warning(f"Gave up on {len(pending)} throttled batched requests")
+
+  async def get_attachment_by_id(self, email_id:str, attachment_id: str, include_content: bool = True) -> MailAttachmentDto | None:
+    request_configuration = None
+    if not include_content:
+      request_configuration = RequestConfiguration(
+        query_parameters=AttachmentItemRequestBuilder.AttachmentItemRequestBuilderGetQueryParameters(select=ATTACHMENT_SELECT)
+      )
 
-    return 
-  
-  async def get_attachment_by_id(self, email_id:str, attachment_id: str) -> MailAttachmentDto | None:
     attachment = await self._client.users.by_user_id(self._service_user).messages.by_message_id(
-      email_id).attachments.by_attachment_id(attachment_id).get()
+      email_id).attachments.by_attachment_id(attachment_id).get(request_configuration=request_configuration)
+
+    if not attachment:
+      return None
+
     _logger.info(f"Get file {attachment.id} {attachment.content_type}")
-    dto = MailAttachmentDto(
-      odata_type=attachment.odata_type,
-      id=attachment.id, content_type=attachment.content_type,
-      name=attachment.name, size=attachment.size
-    )
+    return _to_attachment_dto(attachment)
+
+  async def download_attachment(self, email_id: str, attachment_id: str, file_path: str) -> str:
+    '''
+    Streams the raw attachment from /$value to file_path, the content is never held in memory or base64 encoded.
+    '''
+    access_token = await self._get_access_token()
+    url = f"{GRAPH_BASE_URL}/users/{self._service_user}/messages/{email_id}/attachments/{attachment_id}/$value"
+    partial_path = path.join(path.dirname(file_path), f".{path.basename(file_path)}.{uuid.uuid4().hex}.part")
+
+    try:
+      async with self._http_client.stream("GET", url, headers={"Authorization": f"Bearer {access_token}"}) as response:
+        response.raise_for_status()
+        with open(partial_path, "wb") as f:
+          async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
+      replace(partial_path, file_path)
+    finally:
+      if path.exists(partial_path):
+        remove(partial_path)
 
-    if isinstance(attachment, FileAttachment):
-      dto.content_bytes = attachment.content_bytes
+    return file_path
 
-    return dto
+  async def _get_access_token(self) -> str:
+    token = await self._credential.get_token(GRAPH_SCOPE)
+    return token.token
 
   async def create_subscription(self):
     expiration = datetime.now(timezone.utc) + timedelta(minutes=600)
@@ -183,7 +391,7 @@ class MailService:
       change_type="created",
       resource=f"users/{settings.MAIL_SERVICE_USER}/mailFolders('inbox')/messages",
       expiration_date_time=expiration,
-      client_state="wipay_automation_api",
+      client_state=settings.MAIL_SUBSCRIPTION_CLIENT_STATE,
       notification_url=f"{settings.APP_HOST_URL}/notification/event"
     )
     await self._client.subscriptions.post(subscription)
@@ -0,0 +1,115 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+import numpy as np
+import pandas as pd
+
+from app.services.report_processing.fac_report_analytics import cents_to_decimal, invalid_row_counts
+
+SWEEP_MODES = ("both", "start", "end")
+
+
+class CutoffSensitivity:
+  '''
+  Prefix sums of count and cents over FAC transactions sorted once by timestamp.
+  The count and total of any window are two binary searches away.
+  '''
+  def __init__(self, transactions: pd.DataFrame):
+    timestamps = transactions["timestamp"].to_numpy(dtype="datetime64[ns]")
+    cents = transactions["amount_cents"].to_numpy(dtype=np.int64)
+
+    order = np.argsort(timestamps, kind="stable")
+    self._timestamps = timestamps[order]
+    self._cents_prefix = np.concatenate(([0], np.cumsum(cents[order], dtype=np.int64)))
+
+  def window(self, start: datetime, end: datetime) -> tuple[int, int]:
+    '''
+    Count and total cents of the transactions in [start, end)
+    '''
+    counts, cents = self._windows(np.array([np.datetime64(start, "ns")]), np.array([np.datetime64(end, "ns")]))
+    return int(counts[0]), int(cents[0])
+
+  def sweep(self, window_start: datetime, window_end: datetime, offsets_minutes: np.ndarray, mode: str = "both") -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Counts and total cents of the window for every offset in minutes, moving the start, the end or both boundaries.
+    '''
+    if mode not in SWEEP_MODES:
+      raise ValueError(f"Unsupported sweep mode {mode}")
+
+    deltas = np.asarray(offsets_minutes, dtype=np.int64) * np.timedelta64(1, "m")
+    starts = np.full(deltas.shape, np.datetime64(window_start, "ns"))
+    ends = np.full(deltas.shape, np.datetime64(window_end, "ns"))
+
+    if mode in ("both", "start"):
+      starts = starts + deltas
+    if mode in ("both", "end"):
+      ends = ends + deltas
+
+    return self._windows(starts, ends)
+
+  def _windows(self, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    first = np.searchsorted(self._timestamps, starts, side="left")
+    last = np.searchsorted(self._timestamps, ends, side="left")
+    last = np.maximum(first, last)
+
+    return last - first, self._cents_prefix[last] - self._cents_prefix[first]
+
+
+def sensitivity_curve(
+  transactions: pd.DataFrame, window_start: datetime, window_end: datetime,
+  max_offset_minutes: int = 120, step_minutes: int = 5,
+  target_count: int | None = None, target_amount: Decimal | None = None
+) -> dict:
+  '''
+  Compact sensitivity of the window count and total to moving its boundaries by up to max_offset_minutes.
+  Only the offsets where the count or total changes are listed, together with the offsets that match the targets.
+  '''
+  engine = CutoffSensitivity(transactions)
+  offsets = np.arange(-max_offset_minutes, max_offset_minutes + 1, max(step_minutes, 1), dtype=np.int64)
+  base_count, base_cents = engine.window(window_start, window_end)
+  target_cents = int((Decimal(target_amount) * 100).to_integral_value()) if target_amount is not None else None
+
+  result = {
+    "window_transaction_count": base_count,
+    "window_transaction_total": str(cents_to_decimal(base_cents)),
+    **invalid_row_counts(transactions),
+    "curves": {}
+  }
+
+  for mode in SWEEP_MODES:
+    counts, cents = engine.sweep(window_start, window_end, offsets, mode=mode)
+
+    changed = np.ones(len(offsets), dtype=bool)
+    changed[1:] = (counts[1:] != counts[:-1]) | (cents[1:] != cents[:-1])
+
+    curve = {
+      "points": [
+        [int(offsets[i]), int(counts[i]), str(cents_to_decimal(cents[i]))]
+        for i in np.flatnonzero(changed)
+      ]
+    }
+
+    if target_count is not None or target_cents is not None:
+      matched = np.ones(len(offsets), dtype=bool)
+      if target_count is not None:
+        matched &= counts == target_count
+      if target_cents is not None:
+        matched &= cents == target_cents
+      curve["matching_offsets"] = _to_ranges(offsets[matched].tolist(), max(step_minutes, 1))
+
+    result["curves"][mode] = curve
+
+  return result
+
+
+def _to_ranges(offsets: List[int], step: int) -> List[List[int]]:
+  '''
+  Collapses consecutive offsets into [first, last] ranges
+  '''
+  ranges: List[List[int]] = []
+  for offset in offsets:
+    if ranges and offset - ranges[-1][1] == step:
+      ranges[-1][1] = offset
+    else:
+      ranges.append([offset, offset])
+  return ranges
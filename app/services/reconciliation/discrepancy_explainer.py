@@ -0,0 +1,159 @@
+from datetime import datetime
+from decimal import Decimal
+from itertools import combinations
+from typing import Dict, List, Tuple
+import time
+import numpy as np
+import pandas as pd
+
+from app.dtos.reconciliation.discrepancy_explanation_dto import (
+  DiscrepancyExplanationDto, DiscrepancyExplanationResultDto, DiscrepancyTransactionDto
+)
+from app.services.report_processing.fac_report_analytics import cents_to_decimal, format_timestamp, invalid_row_counts
+
+MAX_SUBSETS_PER_KEY = 32
+MAX_TABLE_SIZE = 500_000
+MAX_MATCHES = 10_000
+
+
+class _SearchTimeout(Exception):
+  pass
+
+
+def explain_discrepancy(
+  transactions: pd.DataFrame, window_start: datetime, window_end: datetime,
+  target_count: int, target_amount: Decimal,
+  max_candidates: int = 40, max_results: int = 5, time_budget_seconds: float = 2.0
+) -> DiscrepancyExplanationResultDto:
+  '''
+  Looks for sets of transactions near the settlement window cutoffs that explain the difference with the VisaNet totals.
+
+  transactions are the FAC rows from load_fac_transactions and should extend past the window on both sides
+  so that missing transactions can be found. When the window has too many transactions the candidates are
+  the window transactions closest to a cutoff, when it has too few they are the outside transactions closest to a cutoff.
+  Subsets of exactly the count difference summing to the amount difference are found with a meet in the middle search
+  on integer cents and ranked by their total distance to the cutoffs.
+  '''
+  deadline = time.perf_counter() + time_budget_seconds
+
+  timestamps = transactions["timestamp"]
+  in_window = ((timestamps >= window_start) & (timestamps < window_end)).to_numpy()
+
+  window_count = int(in_window.sum())
+  window_cents = int(transactions["amount_cents"].to_numpy()[in_window].sum())
+  target_cents = int((Decimal(target_amount) * 100).to_integral_value())
+
+  count_difference = target_count - window_count
+  cents_difference = target_cents - window_cents
+
+  result = DiscrepancyExplanationResultDto(
+    window_transaction_count=window_count, window_transaction_total=cents_to_decimal(window_cents),
+    count_difference=count_difference, amount_difference=cents_to_decimal(cents_difference),
+    candidates_considered=0, timed_out=False, explanations=[], **invalid_row_counts(transactions)
+  )
+
+  if count_difference == 0:
+    return result
+
+  # Including transactions raises the total and removing them lowers it, so the subset sums to the amount gap
+  # signed by the direction of the count gap. Gaps pointing in opposite directions cannot be explained this way.
+  if count_difference > 0:
+    action = "include"
+    candidates = transactions[~in_window]
+    subset_cents = cents_difference
+  else:
+    action = "remove"
+    candidates = transactions[in_window]
+    subset_cents = -cents_difference
+
+  if subset_cents < 0:
+    return result
+
+  subset_size = abs(count_difference)
+
+  distances = _minutes_from_cutoff(candidates["timestamp"], window_start, window_end)
+  order = np.argsort(distances, kind="stable")[:max_candidates]
+
+  candidates = candidates.iloc[order]
+  distances = distances[order]
+  amounts = candidates["amount_cents"].to_numpy().tolist()
+  result.candidates_considered = len(candidates)
+
+  try:
+    matches = _find_subsets(amounts, subset_size, subset_cents, deadline)
+  except _SearchTimeout as timeout:
+    matches = timeout.args[0]
+    result.timed_out = True
+
+  ranked = sorted(matches, key=lambda subset: sum(distances[i] for i in subset))[:max_results]
+
+  for subset in ranked:
+    rows = [candidates.iloc[i] for i in subset]
+    result.explanations.append(DiscrepancyExplanationDto(
+      action=action,
+      transactions=[
+        DiscrepancyTransactionDto(
+          order_id=str(row["order_id"]), timestamp=format_timestamp(row["timestamp"]),
+          amount=cents_to_decimal(row["amount_cents"]), minutes_from_cutoff=round(float(distances[i]), 2)
+        )
+        for i, row in zip(subset, rows)
+      ],
+      total_minutes_from_cutoff=round(float(sum(distances[i] for i in subset)), 2)
+    ))
+
+  return result
+
+
+def _minutes_from_cutoff(timestamps: pd.Series, window_start: datetime, window_end: datetime) -> np.ndarray:
+  values = timestamps.to_numpy(dtype="datetime64[ns]")
+  start = np.datetime64(window_start, "ns")
+  end = np.datetime64(window_end, "ns")
+
+  to_start = np.abs(values - start) / np.timedelta64(1, "m")
+  to_end = np.abs(values - end) / np.timedelta64(1, "m")
+
+  return np.minimum(to_start, to_end)
+
+
+def _find_subsets(amounts: List[int], subset_size: int, subset_cents: int, deadline: float) -> List[Tuple[int, ...]]:
+  '''
+  Meet in the middle: every subset of the second half is indexed by (size, sum), then each subset of the first
+  half looks up the complement it needs. Raises _SearchTimeout with the matches so far once the deadline passes.
+  '''
+  middle = len(amounts) // 2
+  first_half = list(range(middle))
+  second_half = list(range(middle, len(amounts)))
+
+  table: Dict[Tuple[int, int], List[Tuple[int, ...]]] = {}
+  table_size = 0
+  matches: List[Tuple[int, ...]] = []
+
+  checked = 0
+  for size in range(0, min(subset_size, len(second_half)) + 1):
+    for subset in combinations(second_half, size):
+      checked += 1
+      if checked % 1024 == 0 and time.perf_counter() > deadline:
+        raise _SearchTimeout(matches)
+
+      total = sum(amounts[i] for i in subset)
+      if total > subset_cents:
+        continue
+
+      bucket = table.setdefault((size, total), [])
+      if len(bucket) < MAX_SUBSETS_PER_KEY and table_size < MAX_TABLE_SIZE:
+        bucket.append(subset)
+        table_size += 1
+
+  for size in range(max(0, subset_size - len(second_half)), min(subset_size, len(first_half)) + 1):
+    for subset in combinations(first_half, size):
+      checked += 1
+      if checked % 1024 == 0 and time.perf_counter() > deadline:
+        raise _SearchTimeout(matches)
+
+      total = sum(amounts[i] for i in subset)
+      for other in table.get((subset_size - size, subset_cents - total), []):
+        matches.append(subset + other)
+        if len(matches) >= MAX_MATCHES:
+          return matches
+
+  return matches
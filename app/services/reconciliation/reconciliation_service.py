@@ -0,0 +1,121 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dtos.reconciliation.reconciliation_result_dto import ReconciliationResultDto
+from app.dtos.settlement.create_settlement_dto import CreateSettlementDto
+from app.dtos.settlement.update_settlement_dto import UpdateSettlementDto
+from app.exceptions.settlement_exceptions import SettlementAlreadyCompletedError
+from app.services.report_processing.fac_report_analytics import summarize_fac_report
+from app.services.report_processing.fac_report_store import FAC_WINDOW_CUTOFF
+from app.services.report_processing.report_service import ReportService
+from app.services.report_processing.visa_net_extraction_service import VisaNetExtractionService
+from app.services.settlement_processing.settlement_service import SettlementService
+import logging
+
+logger = logging.getLogger(__name__)
+
+TUESDAY = 1
+
+
+def get_settlement_fac_window(visa_net_report_date: date) -> tuple[datetime, datetime]:
+  '''
+  FAC window settled by a VisaNet report, following the accounting instruction.
+  Tuesday reports settle the previous Friday to Sunday, other days settle the day 2 days before the report date.
+  '''
+  if visa_net_report_date.weekday() == TUESDAY:
+    start_date = visa_net_report_date - timedelta(days=4)
+  else:
+    start_date = visa_net_report_date - timedelta(days=2)
+  end_date = visa_net_report_date - timedelta(days=1)
+
+  return datetime.combine(start_date, FAC_WINDOW_CUTOFF), datetime.combine(end_date, FAC_WINDOW_CUTOFF)
+
+
+class ReconciliationService:
+  '''
+  Runs the mechanical part of the accounting instruction in process, the assistant is only needed when totals differ.
+  '''
+  def __init__(self, db: AsyncSession, report_service: ReportService):
+    self.db = db
+    self.report_service = report_service
+
+  async def reconcile(self, visa_net_report_file_name: str, email_id: str | None = None, attachment_id: str | None = None) -> ReconciliationResultDto:
+    extraction = await VisaNetExtractionService(self.db).extract(visa_net_report_file_name)
+
+    if not extraction:
+      raise ValueError(f"Unable to extract VisaNet data from {visa_net_report_file_name}")
+
+    count, amount, report_date = extraction
+    result = ReconciliationResultDto(
+      visa_net_report_file_name=visa_net_report_file_name, visa_net_report_date=report_date,
+      visa_net_transaction_count=count, visa_net_settlement_amount=amount
+    )
+
+    settlement_service = SettlementService(self.db)
+    try:
+      await settlement_service.create_settlement(CreateSettlementDto(
+        visa_net_report_date=report_date.strftime("%Y-%m-%d"), visa_net_settlement_amount=amount,
+        visa_net_transaction_count=count, visa_net_report_fileName=visa_net_report_file_name,
+        email_id=email_id, attachment_id=attachment_id
+      ))
+    except SettlementAlreadyCompletedError:
+      logger.info(f"Settlement for {report_date} was already completed")
+      result.is_already_completed = True
+      return result
+
+    start, end = get_settlement_fac_window(report_date)
+    fac_report_file_name = f"fac_report_{start.strftime('%m_%d_%Y')}"
+
+    csv_file_path = await self.report_service.get_window_csv_report(start, end, fac_report_file_name)
+    summary = await asyncio.to_thread(summarize_fac_report, csv_file_path)
+
+    result.fac_report_file_name = Path(csv_file_path).stem
+    result.fac_start_date = start.date()
+    result.fac_end_date = end.date()
+    result.fac_transaction_count = summary["transaction_count"]
+    result.fac_transaction_total = Decimal(summary["transaction_total"])
+    result.fac_invalid_row_count = summary["invalid_timestamp_rows"] + summary["invalid_amount_rows"]
+    # Totals built without the unparseable rows are never accepted as a match
+    result.is_matched = (
+      result.fac_invalid_row_count == 0
+      and result.fac_transaction_count == count and result.fac_transaction_total == amount
+    )
+
+    logger.info(
+      f"Reconciled {visa_net_report_file_name}: VisaNet {count} / {amount}, "
+      f"FAC {result.fac_transaction_count} / {result.fac_transaction_total}, "
+      f"{result.fac_invalid_row_count} unparseable FAC rows, matched {result.is_matched}"
+    )
+
+    if result.is_matched:
+      await settlement_service.update_settlement(UpdateSettlementDto(
+        visa_net_report_date=report_date.strftime("%Y-%m-%d"),
+        fac_report_file_name=result.fac_report_file_name,
+        fac_report_start_date=result.fac_start_date.strftime("%Y-%m-%d"),
+        fac_report_end_date=result.fac_end_date.strftime("%Y-%m-%d"),
+        fac_report_transaction_count=result.fac_transaction_count,
+        fac_report_transaction_total=result.fac_transaction_total
+      ))
+
+    return result
+
+
+def build_discrepancy_message(result: ReconciliationResultDto) -> str:
+  '''
+  Message handed to the accounting assistant when the deterministic check finds a discrepancy.
+  '''
+  invalid_rows = (
+    f" The FAC report also has {result.fac_invalid_row_count} rows with an unparseable date or amount that are not in its totals."
+    if result.fac_invalid_row_count else ""
+  )
+  return (
+    f"Reconcile the VisaNet report {result.visa_net_report_file_name}. "
+    f"The settlement record for {result.visa_net_report_date.strftime('%Y-%m-%d')} has already been created and "
+    f"the VisaNet report has a transaction count of {result.visa_net_transaction_count} and a total of {result.visa_net_settlement_amount}. "
+    f"The FAC report {result.fac_report_file_name} from {result.fac_start_date.strftime('%m/%d/%Y')} 6AM to "
+    f"{result.fac_end_date.strftime('%m/%d/%Y')} 5:59AM has a transaction count of {result.fac_transaction_count} "
+    f"and a total of {result.fac_transaction_total}. These do not match, continue from step 4 to resolve the discrepancies.{invalid_rows}"
+  )
@@ -0,0 +1,29 @@
+import asyncio
+from datetime import datetime
+import pandas as pd
+
+from app.services.report_processing.fac_report_analytics import load_fac_transactions
+from app.services.report_processing.fac_report_store import pad_fac_window
+from app.services.report_processing.report_service import ReportService
+from app.settings import settings
+
+
+def window_padding_days() -> int:
+  return max(settings.FAC_REPORT_PADDING_DAYS, 1)
+
+
+async def load_padded_window_transactions(report_service: ReportService, start: datetime, end: datetime) -> pd.DataFrame:
+  '''
+  FAC transactions of the window widened by at least a day on both sides, fetched through the report store
+  '''
+  padded_start, padded_end = pad_fac_window(start, end, window_padding_days(), datetime.now())
+  entry = await report_service.prefetch_window(padded_start, padded_end)
+
+  def load() -> pd.DataFrame:
+    transactions = load_fac_transactions(report_service.get_stored_report_path(entry))
+    window = transactions[(transactions["timestamp"] >= padded_start) & (transactions["timestamp"] < padded_end)]
+    # Unparseable rows have no timestamp, so they are reported for the whole padded report
+    window.attrs = dict(transactions.attrs)
+    return window
+
+  return await asyncio.to_thread(load)
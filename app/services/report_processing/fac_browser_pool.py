@@ -0,0 +1,160 @@
+import asyncio
+from contextlib import asynccontextmanager
+from os import path, makedirs
+from typing import AsyncIterator
+from urllib.parse import urljoin
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright, Route
+from app.settings import APP_ROOT, settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCE_TYPES = {"image", "font", "stylesheet", "media"}
+
+
+class FacBrowserPool:
+  '''
+  Long lived Chromium instance with a logged in FAC portal context.
+
+  The login session is persisted as playwright storage state so it survives
+  restarts, and the browser is recycled after a number of reports to cap memory.
+  '''
+  def __init__(self, storage_state_path: str, max_reports_per_browser: int, block_static_resources: bool = True):
+    self._storage_state_path = storage_state_path
+    self._max_reports_per_browser = max_reports_per_browser
+    self._block_static_resources = block_static_resources
+
+    self._playwright: Playwright | None = None
+    self._browser: Browser | None = None
+    self._context: BrowserContext | None = None
+
+    self._lock = asyncio.Lock()
+    self._login_lock = asyncio.Lock()
+    self._active_pages = 0
+    self._reports_since_launch = 0
+
+  @property
+  def main_url(self) -> str:
+    return urljoin(settings.FAC_BASE_URL, "main.htm")
+
+  async def start(self):
+    async with self._lock:
+      if not self._playwright:
+        self._playwright = await async_playwright().start()
+        logger.info("FAC browser pool started")
+
+  async def stop(self):
+    async with self._lock:
+      await self._close_browser()
+      if self._playwright:
+        await self._playwright.stop()
+        self._playwright = None
+        logger.info("FAC browser pool stopped")
+
+  @asynccontextmanager
+  async def page(self) -> AsyncIterator[Page]:
+    '''
+    Yields a page on the FAC portal main frame set, logging in again only when the stored session has expired.
+    '''
+    async with self._lock:
+      await self._ensure_context()
+      context = self._context
+      self._active_pages += 1
+
+    page: Page | None = None
+    try:
+      page = await context.new_page()
+      await self._ensure_logged_in(page)
+      yield page
+    finally:
+      if page:
+        await page.close()
+      await self._release()
+
+  async def _release(self):
+    async with self._lock:
+      self._active_pages -= 1
+      self._reports_since_launch += 1
+
+      if self._active_pages == 0 and self._reports_since_launch >= self._max_reports_per_browser:
+        logger.info(f"Recycling FAC browser after {self._reports_since_launch} reports")
+        await self._close_browser()
+
+  async def _ensure_context(self):
+    if not self._playwright:
+      self._playwright = await async_playwright().start()
+
+    if self._browser and not self._browser.is_connected():
+      logger.info("FAC browser disconnected. Relaunching")
+      self._browser = None
+      self._context = None
+
+    if not self._browser:
+      self._browser = await self._playwright.chromium.launch(headless=True, args=["--no-sandbox", "--disable-dev-shm-usage"])
+      self._reports_since_launch = 0
+
+    if not self._context:
+      storage_state = self._storage_state_path if path.exists(self._storage_state_path) else None
+      self._context = await self._browser.new_context(storage_state=storage_state, accept_downloads=True)
+
+      if self._block_static_resources:
+        await self._context.route("**/*", self._block_resource)
+
+  async def _close_browser(self):
+    if self._context:
+      try:
+        await self._save_storage_state(self._context)
+      except Exception:
+        logger.warning("Failed to persist FAC session", exc_info=True)
+      await self._context.close()
+      self._context = None
+
+    if self._browser:
+      await self._browser.close()
+      self._browser = None
+
+    self._reports_since_launch = 0
+
+  async def _ensure_logged_in(self, page: Page):
+    await page.goto(self.main_url)
+
+    if not await self._is_login_page(page):
+      return
+
+    async with self._login_lock:
+      await page.goto(self.main_url)
+      if not await self._is_login_page(page):
+        return
+
+      logger.info("FAC session expired. Logging in")
+      await page.goto(settings.FAC_BASE_URL)
+      await page.fill("#txtUID", settings.FAC_USERNAME)
+      await page.fill("#txtPwd", settings.FAC_PASSWORD)
+      await page.get_by_role("button", name="Login").click()
+
+      await page.wait_for_url("**/main.htm")
+      logger.info("Logged in to FAC")
+
+      await self._save_storage_state(page.context)
+
+  async def _is_login_page(self, page: Page) -> bool:
+    if not page.url.endswith("main.htm"):
+      return True
+    return await page.locator("#txtUID").count() > 0
+
+  async def _save_storage_state(self, context: BrowserContext):
+    makedirs(path.dirname(self._storage_state_path), exist_ok=True)
+    await context.storage_state(path=self._storage_state_path)
+
+  async def _block_resource(self, route: Route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+      await route.abort()
+    else:
+      await route.continue_()
+
+
+fac_browser_pool = FacBrowserPool(
+  storage_state_path=settings.FAC_STORAGE_STATE_PATH or path.join(APP_ROOT.parent, ".playwright", "fac_storage_state.json"),
+  max_reports_per_browser=settings.FAC_BROWSER_MAX_REPORTS,
+  block_static_resources=settings.FAC_BLOCK_STATIC_RESOURCES
+)
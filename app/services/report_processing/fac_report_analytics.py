@@ -0,0 +1,79 @@
+from datetime import datetime
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def load_fac_transactions(csv_file_path: str) -> pd.DataFrame:
+  '''
+  Loads a FAC report csv as timestamp, order_id and amount_cents columns sorted by timestamp.
+  Amounts are kept as integer cents so totals are exact.
+  Rows with an unparseable timestamp or amount are left out and counted in attrs, see invalid_row_counts.
+  '''
+  df = pd.read_csv(csv_file_path, usecols=["Date Time", "Order ID", "Amount"], dtype={"Order ID": str})
+
+  timestamps = pd.to_datetime(df["Date Time"], format="mixed", errors="coerce")
+  amounts = pd.to_numeric(df["Amount"], errors="coerce")
+  invalid_timestamp = timestamps.isna().to_numpy()
+  invalid_amount = amounts.isna().to_numpy() & ~invalid_timestamp
+  valid = ~(invalid_timestamp | invalid_amount)
+
+  transactions = pd.DataFrame({
+    "timestamp": timestamps[valid],
+    "order_id": df["Order ID"][valid],
+    "amount_cents": np.rint(amounts[valid].to_numpy() * 100).astype(np.int64)
+  })
+  transactions = transactions.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+  transactions.attrs["invalid_timestamp_rows"] = int(invalid_timestamp.sum())
+  transactions.attrs["invalid_amount_rows"] = int(invalid_amount.sum())
+  if not valid.all():
+    logger.warning(f"FAC report {csv_file_path} has unparseable rows: {invalid_row_counts(transactions)}")
+
+  return transactions
+
+
+def invalid_row_counts(transactions: pd.DataFrame) -> dict:
+  '''
+  Rows of the source report that load_fac_transactions could not parse, reported next to any total built from it
+  '''
+  return {
+    "invalid_timestamp_rows": int(transactions.attrs.get("invalid_timestamp_rows", 0)),
+    "invalid_amount_rows": int(transactions.attrs.get("invalid_amount_rows", 0))
+  }
+
+
+def cents_to_decimal(cents: int) -> Decimal:
+  return (Decimal(int(cents)) / Decimal(100)).quantize(Decimal("0.01"))
+
+
+def format_timestamp(value: datetime | pd.Timestamp | None) -> str | None:
+  if value is None or pd.isna(value):
+    return None
+  return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def summarize_fac_transactions(transactions: pd.DataFrame) -> dict:
+  hourly = (
+    transactions.groupby(transactions["timestamp"].dt.floor("h"))["amount_cents"]
+    .agg(["count", "sum"])
+  )
+
+  return {
+    "transaction_count": int(len(transactions)),
+    "transaction_total": str(cents_to_decimal(transactions["amount_cents"].sum())),
+    "first_transaction_at": format_timestamp(transactions["timestamp"].min()) if len(transactions) else None,
+    "last_transaction_at": format_timestamp(transactions["timestamp"].max()) if len(transactions) else None,
+    "hourly_buckets": [
+      {"hour": hour.strftime("%Y-%m-%d %H:00"), "count": int(row["count"]), "total": str(cents_to_decimal(row["sum"]))}
+      for hour, row in hourly.iterrows()
+    ],
+    **invalid_row_counts(transactions)
+  }
+
+
+def summarize_fac_report(csv_file_path: str) -> dict:
+  return summarize_fac_transactions(load_fac_transactions(csv_file_path))
@@ -0,0 +1,114 @@
+import json
+import threading
+from datetime import datetime, time, timedelta
+from os import path, replace
+from typing import List
+import uuid
+import pandas as pd
+from pydantic import BaseModel
+import logging
+
+logger = logging.getLogger(__name__)
+
+FAC_DATE_FORMAT = "%m/%d/%Y"
+FAC_WINDOW_CUTOFF = time(hour=6)
+MANIFEST_FILE_NAME = "manifest.json"
+
+_manifest_lock = threading.Lock()
+
+
+def get_fac_window(fac_start_date: str, fac_end_date: str) -> tuple[datetime, datetime]:
+  '''
+  Transaction time range covered by a FAC report request, 06:00 AM on the start date up to (excluding) 06:00 AM on the end date.
+  Dates in format MM/dd/yyyy. eg. 04/14/2025
+  '''
+  start = datetime.combine(datetime.strptime(fac_start_date, FAC_DATE_FORMAT).date(), FAC_WINDOW_CUTOFF)
+  end = datetime.combine(datetime.strptime(fac_end_date, FAC_DATE_FORMAT).date(), FAC_WINDOW_CUTOFF)
+  return start, end
+
+
+class FacReportStoreEntry(BaseModel):
+  file_name: str
+  merchant: str
+  start: datetime
+  end: datetime
+  created_at: datetime
+
+  def covers(self, merchant: str, start: datetime, end: datetime) -> bool:
+    return self.merchant == merchant and self.start <= start and end <= self.end
+
+
+class FacReportStore:
+  '''
+  Index of downloaded FAC transaction CSVs by the transaction time range they cover.
+
+  Requests that fall inside a stored range are answered by slicing the stored CSV,
+  the manifest lives next to the reports in the FAC report folder.
+  '''
+  def __init__(self, report_folder: str):
+    self._report_folder = report_folder
+    self._manifest_path = path.join(report_folder, MANIFEST_FILE_NAME)
+
+  def entries(self) -> List[FacReportStoreEntry]:
+    if not path.exists(self._manifest_path):
+      return []
+
+    with open(self._manifest_path, "r", encoding="utf-8") as f:
+      raw_entries = json.load(f)
+
+    return [FacReportStoreEntry.model_validate(x) for x in raw_entries]
+
+  def find_covering(self, merchant: str, start: datetime, end: datetime) -> FacReportStoreEntry | None:
+    candidates = [
+      x for x in self.entries()
+      if x.covers(merchant, start, end) and path.exists(self.get_entry_path(x))
+    ]
+
+    if not candidates:
+      return None
+
+    return min(candidates, key=lambda x: x.end - x.start)
+
+  def register(self, entry: FacReportStoreEntry):
+    with _manifest_lock:
+      entries = [x for x in self.entries() if x.file_name != entry.file_name]
+      entries.append(entry)
+
+      partial_path = path.join(self._report_folder, f".{MANIFEST_FILE_NAME}.{uuid.uuid4().hex}.part")
+      with open(partial_path, "w", encoding="utf-8") as f:
+        json.dump([x.model_dump(mode="json") for x in entries], f, indent=2)
+      replace(partial_path, self._manifest_path)
+
+    logger.info(f"Stored FAC window {entry.start} - {entry.end} as {entry.file_name}")
+
+  def get_entry_path(self, entry: FacReportStoreEntry) -> str:
+    return path.join(self._report_folder, entry.file_name)
+
+  def get_window_file_name(self, start: datetime, end: datetime) -> str:
+    return f"fac_window_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
+
+  def slice_to(self, entry: FacReportStoreEntry, start: datetime, end: datetime, csv_file_path: str) -> str:
+    '''
+    Writes the transactions of the stored report within [start, end) to csv_file_path, keeping the stored formatting.
+    '''
+    df = pd.read_csv(self.get_entry_path(entry), dtype=str)
+    timestamps = pd.to_datetime(df["Date Time"], format="mixed", errors="coerce")
+    selected = df[(timestamps >= start) & (timestamps < end)]
+
+    partial_path = path.join(path.dirname(csv_file_path), f".{path.basename(csv_file_path)}.{uuid.uuid4().hex}.part")
+    selected.to_csv(partial_path, index=False)
+    replace(partial_path, csv_file_path)
+
+    return csv_file_path
+
+
+def pad_fac_window(start: datetime, end: datetime, padding_days: int, now: datetime) -> tuple[datetime, datetime]:
+  '''
+  Widens a window by padding_days on both sides so neighbouring days can be answered from the same download.
+  The end is not pushed past the latest complete window.
+  '''
+  padded_start = start - timedelta(days=padding_days)
+  padded_end = end + timedelta(days=padding_days)
+  latest_end = datetime.combine(now.date(), FAC_WINDOW_CUTOFF)
+
+  return padded_start, max(end, min(padded_end, latest_end))
@@ -1,17 +1,34 @@
 import asyncio
-from playwright.async_api import async_playwright
-from os import path, makedirs
+import csv
+import uuid
+from datetime import datetime
+from os import link, path, makedirs, replace
+from shutil import copyfile
 import logging
+import openpyxl
 import pandas as pd
 from pathlib import Path
+from typing import List
 from urllib.parse import urljoin, quote
 from app.settings import APP_ROOT, settings
+from app.services.report_processing.fac_browser_pool import FacBrowserPool, fac_browser_pool
+from app.services.report_processing.fac_report_store import (
+  FAC_DATE_FORMAT, FacReportStore, FacReportStoreEntry, get_fac_window, pad_fac_window
+)
+from app.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+REPORT_COLUMNS = ["Date Time", "Order ID", "Amount", "Ccy"]
+REPORT_HEADER_SEARCH_ROWS = 20
+
+# Shared across ReportService instances so concurrent callers for the same window share one portal session
+_report_flights: SingleFlight = SingleFlight()
+
 class ReportService:
-  def __init__(self):
-    pass
+  def __init__(self, browser_pool: FacBrowserPool | None = None):
+    self._browser_pool = browser_pool or fac_browser_pool
+    self._report_store = FacReportStore(self.get_full_report_folder())
 
   def get_visa_net_file_path(self, file_name: str) -> str:
     return path.join(APP_ROOT, "static", "VisaNetFiles", file_name)
@@ -34,6 +51,15 @@ class ReportService:
   def get_full_report_path(self, file_name: str) -> str:
     return path.join(self.get_full_report_folder(), file_name)
 
+  def get_partial_report_path(self, file_name: str) -> str:
+    '''
+    Temporary path in the report folder, swapped into place with os.replace once the file is complete.
+    '''
+    return path.join(self.get_full_report_folder(), f".{file_name}.{uuid.uuid4().hex}.part")
+
+  def get_report_flight_key(self, kind: str, create_report_dto: dict) -> tuple:
+    return (kind, settings.FAC_MERCHANT_LEGAL_NAME, create_report_dto["fac_start_date"], create_report_dto["fac_end_date"])
+
 
   def get_url_path(self, file_name: str) -> str:
     file_path = path.join(self.get_base_report_folder(), file_name)
@@ -43,6 +69,40 @@ class ReportService:
     return file_path
 
   async def generate_excel_report(self, create_report_dto: dict) -> str | None:
+    '''
+    Concurrent requests for the same merchant and window await the report already being downloaded.
+    The download is saved under the window file name and each caller gets a link or copy under the name it asked for.
+    '''
+    start, end = get_fac_window(create_report_dto["fac_start_date"], create_report_dto["fac_end_date"])
+    window_report_dto = {**create_report_dto, "report_file_name": self._report_store.get_window_file_name(start, end)}
+
+    key = self.get_report_flight_key("excel", create_report_dto)
+    excel_file_path = await _report_flights.do(key, lambda: self._download_excel_report(window_report_dto))
+
+    report_file_name = create_report_dto.get("report_file_name")
+    if not excel_file_path or not report_file_name:
+      return excel_file_path
+
+    return await asyncio.to_thread(self._link_report, excel_file_path, f"{report_file_name}.xlsx")
+
+  def _link_report(self, source_path: str, file_name: str) -> str:
+    '''
+    Hard links source_path into the report folder as file_name, copying when the file system cannot link.
+    '''
+    file_path = self.get_full_report_path(file_name)
+    if path.abspath(source_path) == path.abspath(file_path):
+      return file_path
+
+    partial_file_path = self.get_partial_report_path(file_name)
+    try:
+      link(source_path, partial_file_path)
+    except OSError:
+      copyfile(source_path, partial_file_path)
+    replace(partial_file_path, file_path)
+
+    return file_path
+
+  async def _download_excel_report(self, create_report_dto: dict) -> str | None:
     '''
     Start Date in format MM/dd/yyyy. eg. 04/14/2025
     Start Time in format hh:mm tt. eg. 06:00 AM
@@ -54,9 +114,6 @@ class ReportService:
     max_attempts = 3
 
     fac_settings = {
-      "base_url":  settings.FAC_BASE_URL,
-      "username":  settings.FAC_USERNAME,
-      "password":  settings.FAC_PASSWORD,
       "merchant_legal_name":  settings.FAC_MERCHANT_LEGAL_NAME
     }
 
@@ -71,20 +128,7 @@ class ReportService:
       logger.info(f"Generating report. Attempt {attempts}")
 
       try:
-        async with async_playwright() as p:
-          browser = await p.chromium.launch(headless=True, args=["--no-sandbox", "--disable-dev-shm-usage"], slow_mo=500)
-          context = await browser.new_context()
-          page = await context.new_page()
-
-          await page.goto(fac_settings["base_url"])
-          await page.fill("#txtUID", fac_settings["username"])
-          await page.fill("#txtPwd", fac_settings["password"])
-          await page.get_by_role("button", name="Login").click()
-
-          logger.info(f"Logging in. Attempt {attempts}")
-
-          await page.wait_for_url("**/main.htm")
-
+        async with self._browser_pool.page() as page:
           logger.info(f"Logged in. Attempt {attempts}")
           main_frame = page.frame(name="main")
 
@@ -121,11 +165,12 @@ class ReportService:
           suggested_filename = download.suggested_filename
           file_name = create_report_dto.get("report_file_name") or suggested_filename
           file_path = self.get_full_report_path(f"{file_name}.xlsx")
+          partial_file_path = self.get_partial_report_path(f"{file_name}.xlsx")
 
-          await download.save_as(file_path)
+          await download.save_as(partial_file_path)
+          replace(partial_file_path, file_path)
 
           logger.info(f"Report saved to {file_path}. Attempt {attempts}")
-          await browser.close()
           return str(file_path)
 
       except Exception as error:
@@ -137,24 +182,134 @@ class ReportService:
   def extract_csv_from_report(self, excel_file_path: str) -> str:
     file_name = Path(excel_file_path).stem
 
-    df = pd.read_excel(excel_file_path, engine="openpyxl", header=5)
-
-    selected = df[["Date Time", "Order ID", "Amount", "Ccy"]]
-
     csv_file_path = self.get_full_report_path(f"{file_name}.csv")
+    partial_file_path = self.get_partial_report_path(f"{file_name}.csv")
 
-    selected.to_csv(csv_file_path, index=False)
+    try:
+      self._stream_csv_from_report(excel_file_path, partial_file_path)
+    except Exception:
+      logger.warning(f"Streaming extraction failed for {excel_file_path}. Falling back to pandas", exc_info=True)
+      self._pandas_csv_from_report(excel_file_path, partial_file_path)
+
+    replace(partial_file_path, csv_file_path)
 
     return csv_file_path
 
+  def _stream_csv_from_report(self, excel_file_path: str, csv_file_path: str):
+    '''
+    Row by row projection of the FAC export onto the report columns using openpyxl read only mode
+    '''
+    workbook = openpyxl.load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+      rows = workbook.worksheets[0].iter_rows(values_only=True)
+
+      column_indexes: List[int] | None = None
+      for row_number, row in enumerate(rows):
+        if row_number >= REPORT_HEADER_SEARCH_ROWS:
+          break
+        header = [str(x).strip() if x is not None else "" for x in row]
+        if all(x in header for x in REPORT_COLUMNS):
+          column_indexes = [header.index(x) for x in REPORT_COLUMNS]
+          break
+
+      if column_indexes is None:
+        raise ValueError(f"Unable to locate report header in {excel_file_path}")
+
+      with open(csv_file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+
+        for row in rows:
+          if all(x is None or x == "" for x in row):
+            continue
+          writer.writerow([self._format_report_value(row[i] if i < len(row) else None) for i in column_indexes])
+    finally:
+      workbook.close()
+
+  def _format_report_value(self, value) -> str:
+    if value is None:
+      return ""
+    if isinstance(value, datetime):
+      return value.isoformat(sep=" ", timespec="milliseconds")
+    return str(value)
+
+  def _pandas_csv_from_report(self, excel_file_path: str, csv_file_path: str):
+    df = pd.read_excel(excel_file_path, engine="openpyxl", header=5)
+
+    selected = df[REPORT_COLUMNS]
+
+    selected.to_csv(csv_file_path, index=False)
+
   async def generate_csv_report(self, create_report_dto: dict) -> str:
     logger.info(f"Generate report params {create_report_dto}")
 
-    if self.is_existing_report(f"{create_report_dto.get("report_file_name")}.csv"):
-      return self.get_full_report_path(f"{create_report_dto.get("report_file_name")}.csv")
+    report_file_name = create_report_dto.get("report_file_name")
+    if self.is_existing_report(f"{report_file_name}.csv"):
+      return self.get_full_report_path(f"{report_file_name}.csv")
+
+    start, end = get_fac_window(create_report_dto["fac_start_date"], create_report_dto["fac_end_date"])
+
+    return await self.get_window_csv_report(start, end, report_file_name or self._report_store.get_window_file_name(start, end))
+
+  async def get_window_csv_report(self, start: datetime, end: datetime, report_file_name: str) -> str:
+    '''
+    Writes the transactions between start and end to report_file_name.csv, from the report store when a stored
+    report covers the window and from the FAC portal otherwise
+    '''
+    merchant = settings.FAC_MERCHANT_LEGAL_NAME
+    entry = self._report_store.find_covering(merchant, start, end)
+
+    if entry:
+      logger.info(f"Serving FAC window {start} - {end} from stored report {entry.file_name}")
+    else:
+      padded_start, padded_end = pad_fac_window(start, end, settings.FAC_REPORT_PADDING_DAYS, datetime.now())
+      entry = await self.prefetch_window(padded_start, padded_end)
+
+    csv_file_path = self.get_full_report_path(f"{report_file_name}.csv")
+    if self._report_store.get_entry_path(entry) == csv_file_path:
+      return csv_file_path
+
+    return await asyncio.to_thread(self._report_store.slice_to, entry, start, end, csv_file_path)
+
+  async def prefetch_window(self, start: datetime, end: datetime) -> FacReportStoreEntry:
+    '''
+    Downloads a single FAC report for the whole window and indexes it in the report store.
+    Used to fetch a multi day superset once when several adjacent windows are needed.
+    '''
+    merchant = settings.FAC_MERCHANT_LEGAL_NAME
+    entry = self._report_store.find_covering(merchant, start, end)
+    if entry:
+      return entry
+
+    create_report_dto = {
+      "fac_start_date": start.strftime(FAC_DATE_FORMAT),
+      "fac_end_date": end.strftime(FAC_DATE_FORMAT),
+      "report_file_name": self._report_store.get_window_file_name(start, end)
+    }
+    key = self.get_report_flight_key("csv", create_report_dto)
+    if _report_flights.is_in_flight(key):
+      logger.info(f"Awaiting in-flight FAC report for {key}")
+
+    return await _report_flights.do(key, lambda: self._build_window_report(create_report_dto))
+
+  def get_stored_report_path(self, entry: FacReportStoreEntry) -> str:
+    return self._report_store.get_entry_path(entry)
+
+  async def _build_window_report(self, create_report_dto: dict) -> FacReportStoreEntry:
+    start, end = get_fac_window(create_report_dto["fac_start_date"], create_report_dto["fac_end_date"])
+    requested_at = datetime.now()
 
     excel_file_path = await self.generate_excel_report(create_report_dto=create_report_dto)
 
     if not excel_file_path:
       raise ValueError("Failed to generate FAC report")
-    return self.extract_csv_from_report(excel_file_path=excel_file_path)
\ No newline at end of file
+    csv_file_path = await asyncio.to_thread(self.extract_csv_from_report, excel_file_path)
+
+    # A window reaching past the time of download is only covered up to that point
+    entry = FacReportStoreEntry(
+      file_name=path.basename(csv_file_path), merchant=settings.FAC_MERCHANT_LEGAL_NAME,
+      start=start, end=min(end, requested_at), created_at=requested_at
+    )
+    await asyncio.to_thread(self._report_store.register, entry)
+
+    return entry
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, List
+
+from app.dependencies import get_db_context
+from app.services.ai.tools.extract_visanet_tool import extract_visa_net_data_from_path
+from app.services.report_processing.visa_net_extraction_service import VisaNetExtractionService, hash_file
+from app.settings import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+  global _process_pool
+  if _process_pool is None:
+    _process_pool = ProcessPoolExecutor(max_workers=settings.VISA_NET_BATCH_WORKERS or os.cpu_count())
+  return _process_pool
+
+
+def shutdown_extraction_pool():
+  global _process_pool
+  if _process_pool is not None:
+    _process_pool.shutdown(wait=True, cancel_futures=True)
+    _process_pool = None
+
+
+async def extract_visa_net_batch(file_paths: List[Path]) -> AsyncIterator[str]:
+  '''
+  Parses the files across the process pool and yields one NDJSON line per file as each completes.
+  Cached extractions are returned without parsing and a failing file does not stop the batch.
+  '''
+  loop = asyncio.get_running_loop()
+  pool = get_extraction_pool()
+  db_lock = asyncio.Lock()
+
+  async with get_db_context() as db:
+    extraction_service = VisaNetExtractionService(db)
+
+    async def extract_one(file_path: Path) -> dict:
+      result = {"file_name": file_path.name}
+      try:
+        content_hash = await asyncio.to_thread(hash_file, file_path)
+
+        async with db_lock:
+          extraction = await extraction_service.get_cached(content_hash)
+        result["cached"] = extraction is not None
+
+        if extraction is None:
+          extraction = await loop.run_in_executor(pool, extract_visa_net_data_from_path, file_path)
+          if extraction:
+            async with db_lock:
+              await extraction_service.store(content_hash, file_path.name, extraction)
+
+        if not extraction:
+          result["status"] = "not_found"
+          return result
+
+        count, amount, report_date = extraction
+        result.update({
+          "status": "ok",
+          "transaction_count": count,
+          "transaction_amount": str(amount),
+          "report_date": report_date.strftime("%Y-%m-%d")
+        })
+      except Exception as e:
+        logger.error(f"Failed to extract {file_path.name}", exc_info=True)
+        result.update({"status": "error", "error": str(e)})
+
+      return result
+
+    tasks = [asyncio.create_task(extract_one(x)) for x in file_paths]
+    try:
+      for completed in asyncio.as_completed(tasks):
+        yield json.dumps(await completed) + "\n"
+    finally:
+      # A client that disconnects closes the generator early, pending extractions must not outlive the session
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
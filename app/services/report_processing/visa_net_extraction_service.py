@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.visa_net_extraction import VisaNetExtractionModel
+from app.services.ai.tools.extract_visanet_tool import PARSER_VERSION, extract_visa_net_data_from_path, get_visa_net_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: Path) -> str:
+  digest = hashlib.sha256()
+  with open(file_path, "rb") as f:
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+class VisaNetExtractionService:
+  '''
+  VisaNet extraction backed by a cache keyed on the SHA-256 of the file content and the parser version,
+  so the same file is only parsed once per parser version.
+  '''
+  def __init__(self, db: AsyncSession):
+    self.db = db
+
+  async def extract(self, pdf_file: str) -> tuple[int, Decimal, date] | None:
+    file_path = get_visa_net_file(pdf_file)
+    if not file_path:
+      return None
+
+    return await self.extract_path(file_path)
+
+  async def extract_path(self, file_path: Path) -> tuple[int, Decimal, date] | None:
+    content_hash = await asyncio.to_thread(hash_file, file_path)
+
+    cached = await self.get_cached(content_hash)
+    if cached:
+      logger.info(f"Using cached extraction for {file_path.name}")
+      return cached
+
+    result = await asyncio.to_thread(extract_visa_net_data_from_path, file_path)
+
+    if result:
+      await self.store(content_hash, file_path.name, result)
+
+    return result
+
+  async def get_cached(self, content_hash: str) -> tuple[int, Decimal, date] | None:
+    try:
+      query = select(VisaNetExtractionModel).where(
+        VisaNetExtractionModel.content_hash == content_hash,
+        VisaNetExtractionModel.parser_version == PARSER_VERSION
+      )
+      found: VisaNetExtractionModel | None = (await self.db.execute(query)).scalar_one_or_none()
+    except Exception:
+      logger.warning("Failed to read VisaNet extraction cache", exc_info=True)
+      await self.db.rollback()
+      return None
+
+    if not found:
+      return None
+
+    return found.transaction_count, found.transaction_amount, found.report_date
+
+  async def store(self, content_hash: str, file_name: str, result: tuple[int, Decimal, date]):
+    count, amount, report_date = result
+
+    # A missing ORIGINAL SALE row parses as a zero count, kept out of the cache so the file is parsed again next time
+    if count == 0:
+      logger.info(f"Not caching zero extraction for {file_name}")
+      return
+
+    statement = insert(VisaNetExtractionModel).values(
+      content_hash=content_hash, parser_version=PARSER_VERSION, file_name=file_name,
+      transaction_count=count, transaction_amount=amount, report_date=report_date
+    ).on_conflict_do_nothing(index_elements=[VisaNetExtractionModel.content_hash, VisaNetExtractionModel.parser_version])
+
+    try:
+      await self.db.execute(statement)
+      await self.db.commit()
+    except Exception:
+      logger.warning("Failed to store VisaNet extraction", exc_info=True)
+      await self.db.rollback()
@@ -1,71 +1,200 @@
-from sqlalchemy import select
+import base64
+from typing import AsyncIterator, Dict, List
+from sqlalchemy import Select, select, update
+from sqlalchemy.dialects.postgresql import insert
 from app.dtos.settlement.create_settlement_dto import CreateSettlementDto
+from app.dtos.settlement.settlement_filter_dto import SettlementFilterDto
 from app.dtos.settlement.update_settlement_dto import UpdateSettlementDto
 from app.enums.settlement_status import SettlementStatus
 from app.exceptions.settlement_exceptions import SettlementAlreadyCompletedError
 from app.models.settlement import SettlementModel
-from datetime import datetime
+from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+# Rows per bulk statement, keeps the bind parameters well under the asyncpg limit
+BULK_UPSERT_CHUNK_SIZE = 1000
+# Rows fetched per round trip from the server side cursor of an export
+EXPORT_BATCH_SIZE = 500
+
+
+def encode_settlement_cursor(settlement: SettlementModel) -> str:
+  return base64.urlsafe_b64encode(settlement.settlement_date.isoformat().encode()).decode()
+
+
+def decode_settlement_cursor(cursor: str) -> date:
+  try:
+    return date.fromisoformat(base64.urlsafe_b64decode(cursor.encode()).decode())
+  except Exception as e:
+    raise ValueError(f"Invalid cursor {cursor}") from e
+
+
+def _settlement_values(dto: CreateSettlementDto) -> dict:
+  return {
+    "name": f"Settlement for {dto.visa_net_report_date}",
+    "description": f"Settlement for {dto.visa_net_report_date}",
+    "settlement_date": datetime.strptime(dto.visa_net_report_date, "%Y-%m-%d").date(),
+    "settlement_transaction_count": dto.visa_net_transaction_count,
+    "settlement_amount": dto.visa_net_settlement_amount,
+    "visa_net_report_file_name": dto.visa_net_report_fileName,
+    "email_id": dto.email_id,
+    "attachment_id": dto.attachment_id,
+    "settlement_status": SettlementStatus.New
+  }
+
+
+def _upsert_statement(values: List[dict]):
+  '''
+  INSERT ... ON CONFLICT (settlement_date) DO UPDATE that refreshes the VisaNet figures of an open settlement.
+  Completed settlements are left untouched by the WHERE clause and are missing from RETURNING.
+  '''
+  statement = insert(SettlementModel).values(values)
+  excluded = statement.excluded
+
+  return statement.on_conflict_do_update(
+    index_elements=[SettlementModel.settlement_date],
+    set_={
+      "settlement_transaction_count": excluded.settlement_transaction_count,
+      "settlement_amount": excluded.settlement_amount,
+      "visa_net_report_file_name": excluded.visa_net_report_file_name,
+      "email_id": func.coalesce(excluded.email_id, SettlementModel.email_id),
+      "attachment_id": func.coalesce(excluded.attachment_id, SettlementModel.attachment_id),
+      "last_attempt_at": func.now(),
+      "attemps": func.coalesce(SettlementModel.attemps, 0) + 1
+    },
+    where=SettlementModel.settlement_status != SettlementStatus.Completed
+  ).returning(SettlementModel.id, SettlementModel.settlement_date)
+
 
 class SettlementService:
   def __init__(self, db: AsyncSession):
     self.db = db
 
-  async def create_settlement(self, dto: CreateSettlementDto):
-    settlement_date = datetime.strptime(dto.visa_net_report_date, "%Y-%m-%d").date()
-    settlement_total = dto.visa_net_settlement_amount
-    settlement_count = dto.visa_net_transaction_count
-    visa_net_report_file_name = dto.visa_net_report_fileName
-
-    settlement_model = SettlementModel(
-      name=f"Settlement for {dto.visa_net_report_date}",
-      description=f"Settlement for {dto.visa_net_report_date}",settlement_date=settlement_date,
-      settlement_transaction_count=settlement_count, settlement_amount=settlement_total,
-      visa_net_report_file_name=visa_net_report_file_name, settlement_status=SettlementStatus.New
-    )
-    query = select(SettlementModel).where(SettlementModel.settlement_date == settlement_date).order_by(SettlementModel.id.asc()).limit(1)
-    result = await self.db.execute(query)
-    found = result.scalar_one_or_none()
+  async def create_settlement(self, dto: CreateSettlementDto) -> int:
+    values = _settlement_values(dto)
 
-    if not found:
-      self.db.add(settlement_model)
-      await self.db.commit()
-      return
+    result = await self.db.execute(_upsert_statement([values]))
+    row = result.first()
+    await self.db.commit()
+
+    if not row:
+      raise SettlementAlreadyCompletedError(f"Settlement for {values['settlement_date']} was already done")
+
+    return row.id
 
-    if found.settlement_status == SettlementStatus.Completed:
-      raise SettlementAlreadyCompletedError(f"Settlement for {found.settlement_date} was already done")
+  async def bulk_upsert_settlements(self, dtos: List[CreateSettlementDto]) -> List[date]:
+    '''
+    Backfill variant of create_settlement, one statement per chunk of days.
+    Returns the settlement dates written, completed settlements are skipped rather than raising.
+    '''
+    # A single statement cannot touch the same date twice, the last dto for a date wins
+    by_date: Dict[date, dict] = {}
+    for dto in dtos:
+      values = _settlement_values(dto)
+      by_date[values["settlement_date"]] = values
+
+    rows = list(by_date.values())
+    written: List[date] = []
+
+    for offset in range(0, len(rows), BULK_UPSERT_CHUNK_SIZE):
+      result = await self.db.execute(_upsert_statement(rows[offset:offset + BULK_UPSERT_CHUNK_SIZE]))
+      written.extend(x.settlement_date for x in result)
+
+    await self.db.commit()
+    return written
 
 
   async def update_settlement(self, dto: UpdateSettlementDto) -> None:
     settlement_date = datetime.strptime(dto.visa_net_report_date, "%Y-%m-%d").date()
-    
-    query = select(SettlementModel).where(SettlementModel.settlement_date == settlement_date).order_by(SettlementModel.id.asc()).limit(1)
-    result = await self.db.execute(query)
-    
-    settlement_model: SettlementModel | None = result.scalar_one_or_none()
 
-    if not settlement_model:
-      raise ValueError("Settlement record does not exist")
-    
-    if settlement_model.settlement_status == SettlementStatus.Completed:
-      raise SettlementAlreadyCompletedError(f"Settlement for {settlement_model.settlement_date} was already done")
-    
-    if dto.fac_report_start_date:
-      settlement_model.fac_start_date = datetime.strptime(dto.fac_report_start_date, "%Y-%m-%d").date()
-    
+    values = {
+      "fac_start_date": datetime.strptime(dto.fac_report_start_date, "%Y-%m-%d").date() if dto.fac_report_start_date else settlement_date,
+      "settlement_status": SettlementStatus.Completed,
+      "last_attempt_at": func.now()
+    }
+
     if dto.fac_report_end_date:
-      settlement_model.fac_end_date = datetime.strptime(dto.fac_report_end_date, "%Y-%m-%d").date()
+      values["fac_end_date"] = datetime.strptime(dto.fac_report_end_date, "%Y-%m-%d").date()
 
-    if dto.fac_report_transaction_count:
-      settlement_model.fac_report_transaction_count = dto.fac_report_transaction_count
+    if dto.fac_report_transaction_count is not None:
+      values["fac_report_transaction_count"] = dto.fac_report_transaction_count
 
-    if dto.fac_report_transaction_total:
-      settlement_model.fac_report_transaction_total = dto.fac_report_transaction_total
+    if dto.fac_report_transaction_total is not None:
+      values["fac_report_transaction_total"] = dto.fac_report_transaction_total
 
     if dto.fac_report_file_name:
-      settlement_model.fac_report_file_name = dto.fac_report_file_name
+      values["fac_report_file_name"] = dto.fac_report_file_name
+
+    statement = (
+      update(SettlementModel)
+      .where(SettlementModel.settlement_date == settlement_date, SettlementModel.settlement_status != SettlementStatus.Completed)
+      .values(**values)
+      .returning(SettlementModel.id)
+    )
+    result = await self.db.execute(statement)
+    row = result.first()
+    await self.db.commit()
+
+    if row:
+      return
+
+    # Only the failure path pays a second round trip to tell the two errors apart
+    query = select(SettlementModel.id).where(SettlementModel.settlement_date == settlement_date).limit(1)
+    if (await self.db.execute(query)).scalar_one_or_none() is None:
+      raise ValueError("Settlement record does not exist")
+
+    raise SettlementAlreadyCompletedError(f"Settlement for {settlement_date} was already done")
+
+
+  async def list_settlements(
+    self, filter_dto: SettlementFilterDto, cursor: str | None = None, limit: int = 50, descending: bool = False
+  ) -> tuple[List[SettlementModel], str | None]:
+    '''
+    One page of settlements ordered by settlement_date, continuing after cursor.
+    settlement_date is unique and never null in the filtered query, so it is the whole keyset. The comparison is
+    answered by the unique settlement_date index, or by the status index when filtering on status, however deep the page.
+    '''
+    query = self._filtered_query(filter_dto)
+
+    if cursor:
+      after = decode_settlement_cursor(cursor)
+      query = query.where(SettlementModel.settlement_date < after if descending else SettlementModel.settlement_date > after)
+
+    if descending:
+      query = query.order_by(SettlementModel.settlement_date.desc())
+    else:
+      query = query.order_by(SettlementModel.settlement_date.asc())
+
+    settlements = list((await self.db.execute(query.limit(limit + 1))).scalars().all())
+
+    if len(settlements) <= limit:
+      return settlements, None
+
+    return settlements[:limit], encode_settlement_cursor(settlements[limit - 1])
+
+  async def stream_settlements(self, filter_dto: SettlementFilterDto) -> AsyncIterator[SettlementModel]:
+    '''
+    Every matching settlement through a server side cursor, EXPORT_BATCH_SIZE rows at a time.
+    '''
+    query = (
+      self._filtered_query(filter_dto)
+      .order_by(SettlementModel.settlement_date.asc())
+      .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    async for settlement in await self.db.stream_scalars(query):
+      yield settlement
+
+  def _filtered_query(self, filter_dto: SettlementFilterDto) -> Select:
+    query = select(SettlementModel).where(SettlementModel.settlement_date.is_not(None))
+
+    if filter_dto.status is not None:
+      query = query.where(SettlementModel.settlement_status == filter_dto.status)
+
+    if filter_dto.date_from:
+      query = query.where(SettlementModel.settlement_date >= filter_dto.date_from)
 
-    settlement_model.fac_start_date = settlement_date
-    settlement_model.settlement_status = SettlementStatus.Completed
+    if filter_dto.date_to:
+      query = query.where(SettlementModel.settlement_date <= filter_dto.date_to)
 
-    await self.db.commit()
\ No newline at end of file
+    return query
@@ -0,0 +1,27 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from app.models.sync_state import SyncStateModel
+
+
+class SyncStateService:
+  '''
+  Small key value store for sync checkpoints such as the mail backlog position.
+  '''
+  def __init__(self, db: AsyncSession):
+    self.db = db
+
+  async def get(self, key: str) -> str | None:
+    result = await self.db.execute(select(SyncStateModel.value).where(SyncStateModel.key == key))
+    return result.scalar_one_or_none()
+
+  async def set(self, key: str, value: str | None):
+    statement = insert(SyncStateModel).values(key=key, value=value, updated_at=func.now())
+    statement = statement.on_conflict_do_update(
+      index_elements=[SyncStateModel.key], set_={"value": statement.excluded.value, "updated_at": func.now()}
+    )
+
+    await self.db.execute(statement)
+    await self.db.commit()
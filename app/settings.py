@@ -11,11 +11,45 @@ class Settings(BaseSettings):
   SQLALCHEMY_DATABASE_URI: str
   SQLALCHEMY_TRACK_MODIFICATIONS: bool = False
   DEBUG: bool = True
+  DB_POOL_SIZE: int = 5
+  DB_MAX_OVERFLOW: int = 10
+  DB_POOL_TIMEOUT_SECONDS: float = 30
+  DB_POOL_PRE_PING: bool = True
+  DB_POOL_RECYCLE_SECONDS: int = 1800
+  DB_STATEMENT_CACHE_SIZE: int = 100
   # FAC Settings
   FAC_BASE_URL: str = "https://marlin.firstatlanticcommerce.com/sentry/paymentgateway/merchant/administration/WfrmLogin.aspx"
   FAC_MERCHANT_LEGAL_NAME: str = "Wipay JMMB"
   FAC_USERNAME: str
   FAC_PASSWORD: str
+  FAC_STORAGE_STATE_PATH: str | None = None
+  FAC_BROWSER_MAX_REPORTS: int = 20
+  FAC_BLOCK_STATIC_RESOURCES: bool = True
+  FAC_REPORT_PADDING_DAYS: int = 1
+  VISA_NET_BATCH_WORKERS: int | None = None
+  VISA_NET_MAX_ATTACHMENT_BYTES: int = 10 * 1024 * 1024
+  # Job queue, postgres or memory
+  JOB_QUEUE_BACKEND: str = "postgres"
+  JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300
+  JOB_MAX_ATTEMPTS: int = 5
+  JOB_POLL_INTERVAL_SECONDS: float = 5
+  JOB_QUEUE_MAX_SIZE: int = 1000
+  JOB_QUEUE_PUT_TIMEOUT_SECONDS: float = 2
+  EMAIL_EVENT_CONSUMERS: int = 2
+  SETTLEMENT_EVENT_CONSUMERS: int = 1
+  CONSUMER_DRAIN_TIMEOUT_SECONDS: float = 30
+  MAIL_BACKLOG_DRAIN_ON_STARTUP: bool = True
+  MAIL_BACKLOG_LOOKBACK_HOURS: int = 72
+  MAIL_BACKLOG_PAGE_SIZE: int = 100
+  MAIL_DELTA_POLLER_ENABLED: bool = True
+  MAIL_DELTA_MIN_INTERVAL_SECONDS: float = 10
+  MAIL_DELTA_MAX_INTERVAL_SECONDS: float = 120
+  MAIL_DELTA_INITIAL_LOOKBACK_MINUTES: int = 60
+  EMAIL_EVENT_DEDUP_TTL_SECONDS: int = 24 * 60 * 60
+  EMAIL_EVENT_DEDUP_MAX_SIZE: int = 50_000
+  MAIL_SUBSCRIPTION_CLIENT_STATE: str = "wipay_automation_api"
+  NOTIFICATION_INTAKE_MAX_PENDING: int = 1000
+  NOTIFICATION_RETRY_AFTER_SECONDS: int = 5
   APP_HOST_URL: str
   MAIL_CLIENT_TENANT_ID: str
   MAIL_CLIENT_ID: str
@@ -0,0 +1,68 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class _Timing:
+  __slots__ = ("count", "total", "max")
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+
+class Metrics:
+  '''
+  In process counters, gauges and timings, exposed as a snapshot on the metrics route.
+  '''
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._counters: Dict[str, int] = {}
+    self._gauges: Dict[str, float] = {}
+    self._timings: Dict[str, _Timing] = {}
+
+  def increment(self, name: str, value: int = 1):
+    with self._lock:
+      self._counters[name] = self._counters.get(name, 0) + value
+
+  def set_gauge(self, name: str, value: float):
+    with self._lock:
+      self._gauges[name] = value
+
+  def observe(self, name: str, seconds: float):
+    with self._lock:
+      timing = self._timings.get(name)
+      if timing is None:
+        timing = self._timings[name] = _Timing()
+      timing.count += 1
+      timing.total += seconds
+      timing.max = max(timing.max, seconds)
+
+  @contextmanager
+  def timer(self, name: str):
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(name, time.perf_counter() - started)
+
+  def snapshot(self) -> dict:
+    with self._lock:
+      return {
+        "counters": dict(self._counters),
+        "gauges": dict(self._gauges),
+        "timings": {
+          name: {
+            "count": x.count,
+            "total_seconds": round(x.total, 6),
+            "avg_seconds": round(x.total / x.count, 6) if x.count else 0.0,
+            "max_seconds": round(x.max, 6)
+          }
+          for name, x in self._timings.items()
+        }
+      }
+
+
+metrics = Metrics()
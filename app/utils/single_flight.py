@@ -0,0 +1,33 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+  '''
+  Coalesces concurrent calls that share a key so the work runs once and every caller awaits the same result.
+  '''
+  def __init__(self):
+    self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+  def is_in_flight(self, key: Hashable) -> bool:
+    return key in self._in_flight
+
+  async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+    task = self._in_flight.get(key)
+
+    if task is None:
+      task = asyncio.ensure_future(fn())
+      self._in_flight[key] = task
+      task.add_done_callback(lambda t: self._forget(key, t))
+
+    # Shielded so a caller that goes away does not cancel the job for everyone else
+    return await asyncio.shield(task)
+
+  def _forget(self, key: Hashable, task: asyncio.Task):
+    if self._in_flight.get(key) is task:
+      del self._in_flight[key]
+
+    if not task.cancelled():
+      task.exception()
@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TTLSet:
+  '''
+  Set of recently seen keys. Keys expire after ttl_seconds and the oldest are evicted past max_size.
+  '''
+  def __init__(self, ttl_seconds: float, max_size: int):
+    self._ttl = ttl_seconds
+    self._max_size = max_size
+    self._expires_at: OrderedDict[Hashable, float] = OrderedDict()
+
+  def add(self, key: Hashable) -> bool:
+    '''
+    Adds the key and returns True, or returns False when the key was already seen within the ttl.
+    '''
+    now = time.monotonic()
+    self._evict(now)
+
+    if key in self._expires_at:
+      return False
+
+    self._expires_at[key] = now + self._ttl
+    while len(self._expires_at) > self._max_size:
+      self._expires_at.popitem(last=False)
+
+    return True
+
+  def discard(self, key: Hashable):
+    self._expires_at.pop(key, None)
+
+  def __contains__(self, key: Hashable) -> bool:
+    self._evict(time.monotonic())
+    return key in self._expires_at
+
+  def __len__(self) -> int:
+    return len(self._expires_at)
+
+  def _evict(self, now: float):
+    # Insertion order is expiry order since every key gets the same ttl
+    while self._expires_at:
+      key, expires_at = next(iter(self._expires_at.items()))
+      if expires_at > now:
+        break
+      self._expires_at.popitem(last=False)
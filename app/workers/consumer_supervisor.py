@@ -0,0 +1,123 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List
+
+from app.workers.job_queue import Job, JobQueue
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Consumer:
+  queue: JobQueue
+  handler: Callable[[Any], Awaitable[None]]
+  concurrency: int
+
+
+class ConsumerSupervisor:
+  '''
+  Runs long lived consumer tasks over the job queues, concurrency tasks per registered queue.
+
+  On stop, idle consumers are cancelled straight away and busy ones finish their current job, up to drain_timeout_seconds.
+  Jobs still running after that are cancelled and picked up again once their lease expires.
+  While a handler runs its lease is renewed in the background, so the visibility timeout only bounds how long
+  the job of a crashed consumer stays invisible, not how long a handler may take.
+  '''
+  def __init__(self, drain_timeout_seconds: float):
+    self._drain_timeout = drain_timeout_seconds
+    self._consumers: List[_Consumer] = []
+    self._tasks: List[asyncio.Task] = []
+    self._stopping = asyncio.Event()
+
+  def register(self, queue: JobQueue, handler: Callable[[Any], Awaitable[None]], concurrency: int):
+    self._consumers.append(_Consumer(queue=queue, handler=handler, concurrency=max(concurrency, 1)))
+
+  def start(self):
+    self._stopping.clear()
+
+    for consumer in self._consumers:
+      for index in range(consumer.concurrency):
+        self._tasks.append(asyncio.create_task(
+          self._consume(consumer), name=f"consumer:{consumer.queue.name}:{index}"
+        ))
+
+    _logger.info(f"Started {len(self._tasks)} consumers")
+
+  async def stop(self):
+    if not self._tasks:
+      return
+
+    self._stopping.set()
+    _, pending = await asyncio.wait(self._tasks, timeout=self._drain_timeout)
+
+    for task in pending:
+      task.cancel()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    if pending:
+      _logger.warning(f"Cancelled {len(pending)} consumers that did not drain in time")
+    self._tasks = []
+
+  async def _consume(self, consumer: _Consumer):
+    queue = consumer.queue
+    stopping = asyncio.create_task(self._stopping.wait())
+
+    try:
+      while not self._stopping.is_set():
+        getting = asyncio.create_task(queue.get())
+        await asyncio.wait({getting, stopping}, return_when=asyncio.FIRST_COMPLETED)
+
+        if not getting.done():
+          getting.cancel()
+          await asyncio.gather(getting, return_exceptions=True)
+          break
+
+        try:
+          job = getting.result()
+        except Exception:
+          _logger.error(f"Failed to get a job from {queue.name}", exc_info=True)
+          await asyncio.sleep(1)
+          continue
+
+        try:
+          async with self._leased(queue, job):
+            await consumer.handler(job.payload)
+          await queue.ack(job)
+        except Exception as e:
+          _logger.error(f"Failed to process job {job.id} from {queue.name}", exc_info=True)
+          await self._fail(queue, job, e)
+    finally:
+      stopping.cancel()
+
+  @asynccontextmanager
+  async def _leased(self, queue: JobQueue, job: Job):
+    '''
+    Keeps the lease of a job whose handler runs past the visibility timeout, such as a settlement run waiting on
+    the FAC portal and the assistant, so it is not claimed and run a second time meanwhile.
+    The renewals stop before the job is acknowledged or failed.
+    '''
+    heartbeat = asyncio.create_task(self._heartbeat(queue, job))
+    try:
+      yield
+    finally:
+      heartbeat.cancel()
+      await asyncio.gather(heartbeat, return_exceptions=True)
+
+  async def _heartbeat(self, queue: JobQueue, job: Job):
+    while True:
+      await asyncio.sleep(queue.lease_renewal_interval)
+      try:
+        if not await queue.extend(job):
+          return
+      except Exception:
+        # Retried on the next beat, the lease is a third used up at most
+        _logger.warning(f"Failed to extend the lease of job {job.id} on {queue.name}", exc_info=True)
+
+  async def _fail(self, queue: JobQueue, job, error: Exception):
+    try:
+      await queue.fail(job, error)
+    except Exception:
+      # The lease expires and the job is retried anyway
+      _logger.error(f"Failed to record the failure of job {job.id} on {queue.name}", exc_info=True)
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.dependencies import get_db_context, get_mail_client
+from app.services.sync.sync_state_service import SyncStateService
+from app.settings import settings
+from app.utils.metrics import metrics
+from app.workers.shared_queue import enqueue_email_event
+import logging
+
+_logger = logging.getLogger(__name__)
+
+DELTA_LINK_KEY = "inbox_delta_link"
+
+
+class InboxDeltaPoller:
+  '''
+  Polls the inbox with Graph delta queries and feeds new messages into the email event queue, next to the webhook.
+
+  The delta link is persisted in sync_state so a restart resumes where the last round ended.
+  The interval drops to the minimum whenever a round finds messages and doubles up to the maximum while the inbox is quiet,
+  which bounds detection latency by the maximum interval without relying on webhook delivery.
+  '''
+  def __init__(self, min_interval_seconds: float, max_interval_seconds: float):
+    self._min_interval = min_interval_seconds
+    self._max_interval = max_interval_seconds
+    self._interval = min_interval_seconds
+    self._task: asyncio.Task | None = None
+
+  def start(self):
+    if self._task is None:
+      self._task = asyncio.create_task(self._run(), name="inbox_delta_poller")
+
+  async def stop(self):
+    if self._task is None:
+      return
+
+    self._task.cancel()
+    await asyncio.gather(self._task, return_exceptions=True)
+    self._task = None
+
+  async def poll(self) -> int:
+    '''
+    Runs one delta round and returns the number of new emails queued.
+    '''
+    async with get_db_context() as db:
+      sync_state = SyncStateService(db)
+      delta_link = await sync_state.get(DELTA_LINK_KEY)
+      received_since = datetime.now(timezone.utc) - timedelta(minutes=settings.MAIL_DELTA_INITIAL_LOOKBACK_MINUTES)
+
+      with metrics.timer("inbox_poller.round"):
+        messages, next_delta_link = await get_mail_client().get_inbox_delta(delta_link, received_since)
+
+      queued = 0
+      for message in messages:
+        if await enqueue_email_event(message.id, "delta"):
+          queued += 1
+
+      # Saved after the messages are queued so a failed round is replayed from the same link
+      if next_delta_link and next_delta_link != delta_link:
+        await sync_state.set(DELTA_LINK_KEY, next_delta_link)
+
+    return queued
+
+  async def _run(self):
+    while True:
+      try:
+        queued = await self.poll()
+        self._interval = self._min_interval if queued else min(self._interval * 2, self._max_interval)
+      except asyncio.CancelledError:
+        raise
+      except Exception:
+        _logger.error("Inbox delta poll failed", exc_info=True)
+        metrics.increment("inbox_poller.failures")
+        self._interval = self._max_interval
+
+      metrics.set_gauge("inbox_poller.interval_seconds", self._interval)
+      await asyncio.sleep(self._interval)
+
+
+inbox_poller = InboxDeltaPoller(
+  min_interval_seconds=settings.MAIL_DELTA_MIN_INTERVAL_SECONDS,
+  max_interval_seconds=settings.MAIL_DELTA_MAX_INTERVAL_SECONDS
+)
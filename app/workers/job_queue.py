@@ -0,0 +1,496 @@
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Generic, List, Type, TypeVar
+
+import asyncpg
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.sql import func
+
+from app.db import SessionLocal
+from app.enums.job_status import JobStatus
+from app.exceptions.job_queue_exceptions import JobQueueFullError
+from app.models.job import JobModel
+from app.settings import settings
+import logging
+
+_logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+NOTIFY_CHANNEL = "job_queue"
+RETRY_BACKOFF_SECONDS = 5
+MAX_RETRY_BACKOFF_SECONDS = 300
+CAPACITY_POLL_SECONDS = 0.5
+NOTIFIER_RECONNECT_SECONDS = 1
+MAX_NOTIFIER_RECONNECT_SECONDS = 60
+
+
+@dataclass
+class Job(Generic[T]):
+  id: int
+  payload: T
+  attempts: int
+
+
+def _retry_backoff(attempts: int) -> timedelta:
+  return timedelta(seconds=min(RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_RETRY_BACKOFF_SECONDS))
+
+
+class JobQueue(ABC, Generic[T]):
+  '''
+  Interface shared by the queue backends.
+
+  get waits for the next visible job and leases it for the visibility timeout. A job that is neither acknowledged
+  nor failed before the lease runs out becomes visible again, failed jobs are retried with backoff until max_attempts.
+  The queue holds at most max_size open jobs, put waits up to timeout seconds for room and then raises JobQueueFullError.
+
+  Consumers of jobs that outlast the visibility timeout keep their lease with extend.
+  extend, ack and fail are fenced on the lease: they only apply while the job is still running under the attempt it was
+  claimed with, and return False when the lease expired and the job was claimed again or closed meanwhile.
+  '''
+  def __init__(self, name: str, payload_type: Type[T], visibility_timeout_seconds: int, max_attempts: int, max_size: int):
+    self.name = name
+    self._payload_type = payload_type
+    self._visibility_timeout = timedelta(seconds=visibility_timeout_seconds)
+    self._max_attempts = max_attempts
+    self._max_size = max_size
+
+  async def start(self):
+    pass
+
+  async def stop(self):
+    pass
+
+  @abstractmethod
+  async def put(self, payload: T, timeout: float | None = None) -> int:
+    ...
+
+  @abstractmethod
+  async def size(self) -> int:
+    '''
+    Number of open jobs, pending or running
+    '''
+
+  @abstractmethod
+  async def get(self) -> Job[T]:
+    ...
+
+  @property
+  def lease_renewal_interval(self) -> float:
+    '''
+    Seconds between extend calls of a consumer still working on a job, a third of the lease so one late renewal is survived
+    '''
+    return self._visibility_timeout.total_seconds() / 3
+
+  @abstractmethod
+  async def extend(self, job: Job[T]) -> bool:
+    '''
+    Renews the lease of a running job for another visibility timeout, fenced like ack
+    '''
+    ...
+
+  @abstractmethod
+  async def ack(self, job: Job[T]) -> bool:
+    ...
+
+  @abstractmethod
+  async def fail(self, job: Job[T], error: BaseException | str) -> bool:
+    ...
+
+  async def _wait_for_capacity(self, timeout: float | None, capacity_changed: asyncio.Event | None = None):
+    deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+
+    while await self.size() >= self._max_size:
+      remaining = None if deadline is None else deadline - asyncio.get_running_loop().time()
+      if remaining is not None and remaining <= 0:
+        raise JobQueueFullError(f"Job queue {self.name} is full")
+
+      wait = CAPACITY_POLL_SECONDS if remaining is None else min(CAPACITY_POLL_SECONDS, remaining)
+      if capacity_changed is None:
+        await asyncio.sleep(wait)
+        continue
+
+      capacity_changed.clear()
+      try:
+        await asyncio.wait_for(capacity_changed.wait(), timeout=wait)
+      except asyncio.TimeoutError:
+        pass
+
+  def _dump(self, payload: T) -> Any:
+    if isinstance(payload, BaseModel):
+      return payload.model_dump(mode="json")
+    return payload
+
+  def _load(self, payload: Any) -> T:
+    if issubclass(self._payload_type, BaseModel):
+      return self._payload_type.model_validate(payload)
+    return payload
+
+
+@dataclass
+class _MemoryJob:
+  id: int
+  payload: Any
+  status: JobStatus
+  attempts: int
+  visible_at: datetime
+  last_error: str | None = None
+
+
+class InMemoryJobQueue(JobQueue[T]):
+  '''
+  Same semantics as the Postgres queue, kept in process. Used for local runs and tests without a database.
+  Acknowledged jobs are dropped, failed jobs are kept.
+  '''
+  def __init__(
+    self, name: str, payload_type: Type[T], visibility_timeout_seconds: int, max_attempts: int,
+    max_size: int, poll_interval_seconds: float
+  ):
+    super().__init__(name, payload_type, visibility_timeout_seconds, max_attempts, max_size)
+    self._poll_interval = poll_interval_seconds
+    self._jobs: Dict[int, _MemoryJob] = {}
+    self._ids = itertools.count(1)
+    self._available = asyncio.Event()
+    self._capacity_changed = asyncio.Event()
+
+  async def size(self) -> int:
+    return sum(1 for x in self._jobs.values() if x.status in (JobStatus.Pending, JobStatus.Running))
+
+  async def put(self, payload: T, timeout: float | None = None) -> int:
+    await self._wait_for_capacity(timeout, self._capacity_changed)
+
+    job = _MemoryJob(
+      id=next(self._ids), payload=self._dump(payload), status=JobStatus.Pending,
+      attempts=0, visible_at=datetime.now(timezone.utc)
+    )
+    self._jobs[job.id] = job
+    self._available.set()
+    return job.id
+
+  async def get(self) -> Job[T]:
+    while True:
+      job = self._claim()
+      if job:
+        return job
+
+      self._available.clear()
+      try:
+        await asyncio.wait_for(self._available.wait(), timeout=self._poll_interval)
+      except asyncio.TimeoutError:
+        pass
+
+  async def extend(self, job: Job[T]) -> bool:
+    stored = self._leased(job, "extend")
+    if stored is None:
+      return False
+
+    stored.visible_at = datetime.now(timezone.utc) + self._visibility_timeout
+    return True
+
+  async def ack(self, job: Job[T]) -> bool:
+    stored = self._leased(job, "ack")
+    if stored is None:
+      return False
+
+    # Completed jobs are not kept, only failed ones stay around for inspection
+    del self._jobs[job.id]
+    self._capacity_changed.set()
+    return True
+
+  async def fail(self, job: Job[T], error: BaseException | str) -> bool:
+    stored = self._leased(job, "fail")
+    if stored is None:
+      return False
+
+    stored.last_error = str(error)
+
+    if stored.attempts >= self._max_attempts:
+      stored.status = JobStatus.Failed
+      self._capacity_changed.set()
+      return True
+
+    stored.status = JobStatus.Pending
+    stored.visible_at = datetime.now(timezone.utc) + _retry_backoff(stored.attempts)
+    return True
+
+  def _leased(self, job: Job[T], action: str) -> _MemoryJob | None:
+    stored = self._jobs.get(job.id)
+    if stored is None or stored.status != JobStatus.Running or stored.attempts != job.attempts:
+      _logger.warning(f"Ignoring {action} of job {job.id} on {self.name}, its lease for attempt {job.attempts} was lost")
+      return None
+    return stored
+
+  def jobs(self) -> List[_MemoryJob]:
+    return list(self._jobs.values())
+
+  def _claim(self) -> Job[T] | None:
+    now = datetime.now(timezone.utc)
+
+    for stored in self._jobs.values():
+      if stored.status not in (JobStatus.Pending, JobStatus.Running) or stored.visible_at > now:
+        continue
+
+      if stored.attempts >= self._max_attempts:
+        stored.status = JobStatus.Failed
+        stored.last_error = stored.last_error or "Visibility timeout expired"
+        self._capacity_changed.set()
+        continue
+
+      stored.status = JobStatus.Running
+      stored.attempts += 1
+      stored.visible_at = now + self._visibility_timeout
+      return Job(id=stored.id, payload=self._load(stored.payload), attempts=stored.attempts)
+
+    return None
+
+
+class PostgresJobNotifier:
+  '''
+  One LISTEN connection per process that wakes the queue waiting on the notified name.
+  Shared by every Postgres queue, the connection is opened by the first start and closed by the last stop.
+  A lost connection is reopened in the background with backoff, and the waiting queues are woken once it is back
+  since notifications sent meanwhile are gone.
+  '''
+  def __init__(self):
+    self._connection: asyncpg.Connection | None = None
+    self._events: Dict[str, asyncio.Event] = {}
+    self._lock = asyncio.Lock()
+    self._users = 0
+    self._reconnect_task: asyncio.Task | None = None
+
+  def event(self, queue_name: str) -> asyncio.Event:
+    return self._events.setdefault(queue_name, asyncio.Event())
+
+  async def start(self):
+    async with self._lock:
+      if not self._connection or self._connection.is_closed():
+        await self._connect()
+
+      self._users += 1
+
+  async def stop(self):
+    async with self._lock:
+      self._users = max(self._users - 1, 0)
+      if self._users:
+        return
+
+      if self._reconnect_task:
+        self._reconnect_task.cancel()
+        self._reconnect_task = None
+
+      # Cleared first so closing it is not taken for a lost connection
+      connection, self._connection = self._connection, None
+      if connection and not connection.is_closed():
+        await connection.close()
+
+  async def _connect(self):
+    dsn = settings.SQLALCHEMY_DATABASE_URI.replace("postgresql+asyncpg://", "postgresql://", 1)
+    connection = await asyncpg.connect(dsn)
+    await connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+    connection.add_termination_listener(self._on_terminate)
+
+    self._connection = connection
+    _logger.info("Listening for job queue notifications")
+
+  def _on_notify(self, connection, pid, channel, queue_name: str):
+    self.event(queue_name).set()
+
+  def _on_terminate(self, connection):
+    if connection is not self._connection or not self._users:
+      return
+    if self._reconnect_task and not self._reconnect_task.done():
+      return
+
+    _logger.warning(f"Lost the job queue LISTEN connection, consumers poll every {settings.JOB_POLL_INTERVAL_SECONDS}s until it is back")
+    self._reconnect_task = asyncio.create_task(self._reconnect(), name="job_queue_notifier_reconnect")
+
+  async def _reconnect(self):
+    delay = NOTIFIER_RECONNECT_SECONDS
+
+    while True:
+      try:
+        async with self._lock:
+          if not self._users:
+            return
+          await self._connect()
+        break
+      except asyncio.CancelledError:
+        raise
+      except Exception:
+        _logger.warning(f"Failed to reopen the job queue LISTEN connection, retrying in {delay}s", exc_info=True)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_NOTIFIER_RECONNECT_SECONDS)
+
+    for event in self._events.values():
+      event.set()
+
+
+_notifier = PostgresJobNotifier()
+
+
+class PostgresJobQueue(JobQueue[T]):
+  '''
+  Durable queue on the job_queue table. Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED so any number of
+  consumers across processes can share it, and put sends a NOTIFY so waiting consumers wake without polling.
+  The poll interval only covers missed notifications and expired leases.
+  '''
+  def __init__(
+    self, name: str, payload_type: Type[T], visibility_timeout_seconds: int, max_attempts: int,
+    max_size: int, poll_interval_seconds: float
+  ):
+    super().__init__(name, payload_type, visibility_timeout_seconds, max_attempts, max_size)
+    self._poll_interval = poll_interval_seconds
+
+  async def start(self):
+    await _notifier.start()
+
+  async def stop(self):
+    await _notifier.stop()
+
+  async def size(self) -> int:
+    async with SessionLocal() as db:
+      query = select(func.count(JobModel.id)).where(
+        JobModel.queue == self.name, JobModel.status.in_([JobStatus.Pending, JobStatus.Running])
+      )
+      return (await db.execute(query)).scalar_one()
+
+  async def put(self, payload: T, timeout: float | None = None) -> int:
+    await self._wait_for_capacity(timeout)
+
+    async with SessionLocal() as db:
+      job = JobModel(
+        queue=self.name, payload=self._dump(payload), status=JobStatus.Pending,
+        attempts=0, max_attempts=self._max_attempts
+      )
+      db.add(job)
+      await db.flush()
+      await db.execute(select(func.pg_notify(NOTIFY_CHANNEL, self.name)))
+      await db.commit()
+      return job.id
+
+  async def get(self) -> Job[T]:
+    available = _notifier.event(self.name)
+
+    while True:
+      available.clear()
+
+      job = await self._claim()
+      if job:
+        return job
+
+      try:
+        await asyncio.wait_for(available.wait(), timeout=self._poll_interval)
+      except asyncio.TimeoutError:
+        pass
+
+  async def extend(self, job: Job[T]) -> bool:
+    async with SessionLocal() as db:
+      result = await db.execute(
+        update(JobModel).where(*self._lease_condition(job))
+        .values(visible_at=func.now() + self._visibility_timeout, updated_at=func.now())
+      )
+      await db.commit()
+
+    return self._check_lease(job, result.rowcount, "extend")
+
+  async def ack(self, job: Job[T]) -> bool:
+    # Completed jobs are deleted so the table only holds open and failed jobs, like the in memory queue
+    async with SessionLocal() as db:
+      result = await db.execute(delete(JobModel).where(*self._lease_condition(job)))
+      await db.commit()
+
+    return self._check_lease(job, result.rowcount, "ack")
+
+  async def fail(self, job: Job[T], error: BaseException | str) -> bool:
+    exhausted = job.attempts >= self._max_attempts
+    values = {"last_error": str(error), "updated_at": func.now()}
+
+    if exhausted:
+      values["status"] = JobStatus.Failed
+    else:
+      values["status"] = JobStatus.Pending
+      values["visible_at"] = func.now() + _retry_backoff(job.attempts)
+
+    async with SessionLocal() as db:
+      result = await db.execute(update(JobModel).where(*self._lease_condition(job)).values(**values))
+      await db.commit()
+
+    if not self._check_lease(job, result.rowcount, "fail"):
+      return False
+
+    if exhausted:
+      _logger.error(f"Job {job.id} on {self.name} failed after {job.attempts} attempts: {error}")
+    return True
+
+  def _lease_condition(self, job: Job[T]) -> tuple:
+    # A consumer whose lease expired must not overwrite the outcome of the consumer that claimed the job after it
+    return (JobModel.id == job.id, JobModel.status == JobStatus.Running, JobModel.attempts == job.attempts)
+
+  def _check_lease(self, job: Job[T], rowcount: int, action: str) -> bool:
+    if rowcount:
+      return True
+
+    _logger.warning(f"Ignoring {action} of job {job.id} on {self.name}, its lease for attempt {job.attempts} was lost")
+    return False
+
+  async def _claim(self) -> Job[T] | None:
+    async with SessionLocal() as db:
+      # Leases that ran out on their last attempt are closed first so they are not claimed again
+      await db.execute(
+        update(JobModel)
+        .where(
+          JobModel.queue == self.name, JobModel.status == JobStatus.Running,
+          JobModel.visible_at <= func.now(), JobModel.attempts >= JobModel.max_attempts
+        )
+        .values(status=JobStatus.Failed, last_error="Visibility timeout expired", updated_at=func.now())
+      )
+
+      next_job = (
+        select(JobModel.id)
+        .where(
+          JobModel.queue == self.name,
+          JobModel.status.in_([JobStatus.Pending, JobStatus.Running]),
+          JobModel.visible_at <= func.now()
+        )
+        .order_by(JobModel.visible_at, JobModel.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+      )
+
+      claimed = (await db.execute(
+        update(JobModel)
+        .where(JobModel.id == next_job)
+        .values(
+          status=JobStatus.Running, attempts=JobModel.attempts + 1,
+          visible_at=func.now() + self._visibility_timeout, updated_at=func.now()
+        )
+        .returning(JobModel.id, JobModel.payload, JobModel.attempts)
+      )).first()
+
+      await db.commit()
+
+    if not claimed:
+      return None
+
+    return Job(id=claimed.id, payload=self._load(claimed.payload), attempts=claimed.attempts)
+
+
+def create_job_queue(name: str, payload_type: Type[T]) -> JobQueue[T]:
+  options = dict(
+    visibility_timeout_seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    max_size=settings.JOB_QUEUE_MAX_SIZE,
+    poll_interval_seconds=settings.JOB_POLL_INTERVAL_SECONDS
+  )
+
+  if settings.JOB_QUEUE_BACKEND == "memory":
+    return InMemoryJobQueue(name, payload_type, **options)
+  if settings.JOB_QUEUE_BACKEND == "postgres":
+    return PostgresJobQueue(name, payload_type, **options)
+
+  raise ValueError(f"Unsupported job queue backend {settings.JOB_QUEUE_BACKEND}")
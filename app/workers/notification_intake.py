@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+
+from pydantic import ValidationError
+
+from app.dtos.notifications.notification_dto import NotificationDto
+from app.settings import settings
+from app.utils.metrics import metrics
+from app.utils.ttl_set import TTLSet
+from app.workers.shared_queue import enqueue_email_event
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class NotificationIntake:
+  '''
+  Background stage behind the notification webhook. The webhook only hands over the raw body,
+  parsing, clientState validation and de-duplication by (subscriptionId, resourceData.id) happen here.
+  Graph redelivers a notification when the acknowledgement is slow, the redeliveries are dropped by the TTL set.
+
+  A notification is acknowledged before it is queued, so Graph will not redeliver one that is lost after the 202.
+  This happens when it is still buffered at shutdown or when queueing the email fails. Every such loss is logged and
+  counted in notifications.dropped. The inbox delta poller is the recovery path: it finds the email on its next round.
+  Without the poller these emails are only picked up by the next backlog drain. The webhook answers 503 with
+  Retry-After while the stage is full or stopped, so Graph keeps those notifications and redelivers them.
+  '''
+  def __init__(self, max_pending: int, dedup_ttl_seconds: int, dedup_max_size: int):
+    self._pending: asyncio.Queue[tuple[bytes, float]] = asyncio.Queue(maxsize=max_pending)
+    self._seen = TTLSet(ttl_seconds=dedup_ttl_seconds, max_size=dedup_max_size)
+    self._task: asyncio.Task | None = None
+    self._processing = 0
+
+  def submit(self, body: bytes) -> bool:
+    '''
+    Returns False when the stage is full or stopped so the webhook can ask Graph to redeliver.
+    '''
+    if self._task is None:
+      metrics.increment("notifications.rejected_stopped")
+      return False
+
+    try:
+      self._pending.put_nowait((body, time.perf_counter()))
+    except asyncio.QueueFull:
+      metrics.increment("notifications.rejected_full")
+      return False
+
+    metrics.set_gauge("notifications.pending", self._pending.qsize())
+    return True
+
+  def start(self):
+    if self._task is None:
+      self._task = asyncio.create_task(self._run(), name="notification_intake")
+
+    if not settings.MAIL_DELTA_POLLER_ENABLED:
+      _logger.warning("Inbox delta poller is disabled, notifications dropped after acknowledgement are not recovered")
+
+  async def stop(self, drain_timeout_seconds: float = 5):
+    if self._task is None:
+      return
+
+    # Refuses new notifications first so the ones arriving while draining are redelivered
+    task, self._task = self._task, None
+
+    try:
+      await asyncio.wait_for(self._pending.join(), timeout=drain_timeout_seconds)
+    except asyncio.TimeoutError:
+      self._drop(self._pending.qsize() + self._processing, "not processed before shutdown")
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+  async def _run(self):
+    while True:
+      body, received_at = await self._pending.get()
+      self._processing = 1
+      try:
+        await self._process(body)
+      except Exception:
+        _logger.error("Failed to process notification", exc_info=True)
+        self._drop(1, "failed to process")
+      finally:
+        self._processing = 0
+        self._pending.task_done()
+        metrics.observe("notifications.received_to_processed", time.perf_counter() - received_at)
+
+  async def _process(self, body: bytes):
+    try:
+      dto = NotificationDto.model_validate(json.loads(body), strict=False)
+    except (ValueError, ValidationError):
+      metrics.increment("notifications.invalid_payload")
+      _logger.warning("Dropped a notification payload that could not be parsed")
+      return
+
+    for notification in dto.value:
+      metrics.increment("notifications.received")
+
+      if notification.clientState != settings.MAIL_SUBSCRIPTION_CLIENT_STATE:
+        metrics.increment("notifications.invalid_client_state")
+        continue
+      if notification.changeType != "created" or not notification.resourceData.id:
+        continue
+
+      key = (notification.subscriptionId, notification.resourceData.id)
+      if not self._seen.add(key):
+        metrics.increment("notifications.duplicates_dropped")
+        continue
+
+      try:
+        with metrics.timer("notifications.enqueue"):
+          await enqueue_email_event(notification.resourceData.id, "webhook")
+      except Exception:
+        # Already acknowledged, the delta poller picks the email up if it cannot be queued now
+        self._seen.discard(key)
+        metrics.increment("notifications.enqueue_failures")
+        _logger.error(f"Failed to queue email {notification.resourceData.id}", exc_info=True)
+        self._drop(1, f"email {notification.resourceData.id} could not be queued")
+
+  def _drop(self, count: int, reason: str):
+    if not count:
+      return
+
+    metrics.increment("notifications.dropped", count)
+    _logger.error(f"Dropped {count} acknowledged notifications, {reason}. Left to the inbox delta poller to recover")
+
+
+notification_intake = NotificationIntake(
+  max_pending=settings.NOTIFICATION_INTAKE_MAX_PENDING,
+  dedup_ttl_seconds=settings.EMAIL_EVENT_DEDUP_TTL_SECONDS,
+  dedup_max_size=settings.EMAIL_EVENT_DEDUP_MAX_SIZE
+)
@@ -1,6 +1,43 @@
-import asyncio
+from typing import List
 
 from app.dtos.events.settlement_event import SettlementEvent
+from app.settings import settings
+from app.utils.metrics import metrics
+from app.utils.ttl_set import TTLSet
+from app.workers.job_queue import JobQueue, create_job_queue
 
-email_event_queue: asyncio.Queue[str] = asyncio.Queue()
-settlement_event_queue: asyncio.Queue[SettlementEvent] = asyncio.Queue()
\ No newline at end of file
+email_event_queue: JobQueue[str] = create_job_queue("email_event", str)
+settlement_event_queue: JobQueue[SettlementEvent] = create_job_queue("settlement_event", SettlementEvent)
+
+job_queues: List[JobQueue] = [email_event_queue, settlement_event_queue]
+
+# Email ids already handed over by the webhook, the delta poller or the backlog drain
+seen_email_ids = TTLSet(ttl_seconds=settings.EMAIL_EVENT_DEDUP_TTL_SECONDS, max_size=settings.EMAIL_EVENT_DEDUP_MAX_SIZE)
+
+
+async def enqueue_email_event(email_id: str, source: str) -> bool:
+  '''
+  Queues an email event unless another source already queued the same email. Returns False for duplicates.
+  '''
+  if not seen_email_ids.add(email_id):
+    metrics.increment(f"email_events.duplicate.{source}")
+    return False
+
+  try:
+    await email_event_queue.put(email_id, timeout=settings.JOB_QUEUE_PUT_TIMEOUT_SECONDS)
+  except Exception:
+    seen_email_ids.discard(email_id)
+    raise
+
+  metrics.increment(f"email_events.enqueued.{source}")
+  return True
+
+
+async def start_job_queues():
+  for queue in job_queues:
+    await queue.start()
+
+
+async def stop_job_queues():
+  for queue in job_queues:
+    await queue.stop()
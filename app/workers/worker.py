@@ -2,37 +2,76 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import logging
 
 from app.dtos.events.settlement_event import SettlementEvent
+from app.dtos.mail.mail_message_dto import MailMessageDto
 from app.services.automation.settlement_automation import process_settlement_automation
 from ..settings import settings
-from app.workers.shared_queue import email_event_queue, settlement_event_queue
+from app.workers.consumer_supervisor import ConsumerSupervisor
+from app.workers.shared_queue import email_event_queue, seen_email_ids, settlement_event_queue
 from app.services.mail.mail_service import MailService
-from app.services.ai import openai_service
-from app.dependencies import get_mail_client
+from app.services.mail.mail_backlog_service import MailBacklogService
+from app.services.mail.attachment_classifier import is_visa_net_attachment
+from app.dependencies import get_db_context, get_mail_client
+from app.utils.single_flight import SingleFlight
 _logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
+_backlog_flights: SingleFlight[int] = SingleFlight()
 
 async def renew_subscription():
   _logger.info("Renewing subscription")
   _logger.info(f"{settings.APP_HOST_URL} Debug {settings.DEBUG}")
 
 
-async def process_email_event():
-  email_id = await email_event_queue.get()
+async def handle_email_event(email_id: str):
   mail_service: MailService = get_mail_client()
 
   mail_message = await mail_service.get_mail_by_id(email_id=email_id)
 
-  if mail_message and mail_message.has_attachment and mail_message.attachments:
+  if mail_message:
+    await handle_mail_message(mail_message)
+
+
+async def handle_mail_message(mail_message: MailMessageDto):
+  if mail_message.has_attachment and mail_message.attachments:
     for attachment in mail_message.attachments:
       if attachment.name:
-        visa_filename_check = openai_service.isVisaNetSettlementFileName(attachment.name)
+        visa_filename_check = await is_visa_net_attachment(attachment)
 
         if visa_filename_check:
-          await settlement_event_queue.put(SettlementEvent(email_id=mail_message.id, attachment_id=attachment.id))
+          await settlement_event_queue.put(
+            SettlementEvent(email_id=mail_message.id, attachment_id=attachment.id),
+            timeout=settings.JOB_QUEUE_PUT_TIMEOUT_SECONDS
+          )
+
+
+async def handle_settlement_event(settlement_event: SettlementEvent):
+  await process_settlement_automation(settlement_event)
+
+
+async def handle_backlog_message(mail_message: MailMessageDto):
+  # Emails the webhook or the delta poller already queued are skipped
+  if not seen_email_ids.add(mail_message.id):
+    return
+
+  try:
+    await handle_mail_message(mail_message)
+  except Exception:
+    # Released so the next backlog or delta round retries the email instead of skipping it for the dedup TTL
+    seen_email_ids.discard(mail_message.id)
+    raise
+
+
+async def drain_mail_backlog() -> int:
+  '''
+  Handles inbox messages received since the backlog checkpoint, concurrent calls share one drain.
+  '''
+  async def drain():
+    async with get_db_context() as db:
+      return await MailBacklogService(db, get_mail_client()).drain(handle_backlog_message)
 
+  return await _backlog_flights.do("mail_backlog", drain)
 
-async def process_settlement_event():
-  settlement_event = await settlement_event_queue.get()
 
-  await process_settlement_automation(settlement_event)
\ No newline at end of file
+consumer_supervisor = ConsumerSupervisor(drain_timeout_seconds=settings.CONSUMER_DRAIN_TIMEOUT_SECONDS)
+consumer_supervisor.register(email_event_queue, handle_email_event, concurrency=settings.EMAIL_EVENT_CONSUMERS)
+consumer_supervisor.register(settlement_event_queue, handle_settlement_event, concurrency=settings.SETTLEMENT_EVENT_CONSUMERS)
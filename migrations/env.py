@@ -8,7 +8,7 @@ import asyncio
 
 from app.db import Base
 from app.settings import settings
-from app.models import SettlementModel, AssistantModel
+from app.models import SettlementModel, AssistantModel, VisaNetExtractionModel, JobModel, SyncStateModel
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,35 @@
+"""job queue open jobs index
+
+Revision ID: d2a8c6e41f07
+Revises: b5d7e2f4c913
+Create Date: 2025-06-10 09:41:07.214583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8c6e41f07'
+down_revision: Union[str, None] = 'b5d7e2f4c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Acknowledged jobs are deleted from now on, the ones kept so far are purged
+    op.execute("DELETE FROM job_queue WHERE status = 'Completed'")
+    op.drop_index('ix_job_queue_queue_status_visible_at', table_name='job_queue')
+    op.create_index(
+        'ix_job_queue_open_queue_visible_at', 'job_queue', ['queue', 'visible_at'], unique=False,
+        postgresql_where=sa.text("status IN ('Pending', 'Running')")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_queue_open_queue_visible_at', table_name='job_queue', postgresql_where=sa.text("status IN ('Pending', 'Running')"))
+    op.create_index('ix_job_queue_queue_status_visible_at', 'job_queue', ['queue', 'status', 'visible_at'], unique=False)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from app.services.reconciliation.discrepancy_explainer import explain_discrepancy
+
+WINDOW_START = datetime(2025, 5, 1, 6)
+WINDOW_END = datetime(2025, 5, 2, 6)
+
+
+def _transactions(rows):
+  return pd.DataFrame({
+    "timestamp": pd.to_datetime([x[0] for x in rows]),
+    "order_id": [x[1] for x in rows],
+    "amount_cents": np.array([x[2] for x in rows], dtype=np.int64)
+  })
+
+
+def _window_transactions():
+  return _transactions([
+    (WINDOW_START - timedelta(minutes=10), "before", 2500),
+    (WINDOW_START + timedelta(minutes=5), "a", 6350),
+    (WINDOW_START + timedelta(hours=6), "b", 1000),
+    (WINDOW_END - timedelta(minutes=3), "c", 4000),
+    (WINDOW_END + timedelta(minutes=8), "after", 6350)
+  ])
+
+
+def test_remove_matches_lower_count_and_total():
+  # Window holds 3 transactions totalling 113.50, VisaNet settled 2 for 50.00
+  result = explain_discrepancy(_window_transactions(), WINDOW_START, WINDOW_END, 2, Decimal("50.00"))
+
+  assert result.explanations
+  assert result.explanations[0].action == "remove"
+  assert [x.order_id for x in result.explanations[0].transactions] == ["a"]
+
+
+def test_include_matches_higher_count_and_total():
+  result = explain_discrepancy(_window_transactions(), WINDOW_START, WINDOW_END, 4, Decimal("138.50"))
+
+  assert result.explanations[0].action == "include"
+  assert [x.order_id for x in result.explanations[0].transactions] == ["before"]
+
+
+def test_gaps_in_opposite_directions_have_no_explanation():
+  # One transaction fewer but 63.50 more, neither removing nor including a 63.50 transaction gets there
+  result = explain_discrepancy(_window_transactions(), WINDOW_START, WINDOW_END, 2, Decimal("177.00"))
+
+  assert result.count_difference == -1
+  assert result.amount_difference == Decimal("63.50")
+  assert result.explanations == []
+
+  result = explain_discrepancy(_window_transactions(), WINDOW_START, WINDOW_END, 4, Decimal("50.00"))
+
+  assert result.count_difference == 1
+  assert result.explanations == []